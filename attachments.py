@@ -0,0 +1,254 @@
+# Attachment optimisation for the ESFA form emails.
+#
+# Evidence uploads are mostly 12 MP phone photos of passports, bills and
+# payslips.  Before a submission is emailed, every JPEG/PNG upload is turned
+# upright from its EXIF orientation, stripped of EXIF, fitted to an A4 page at
+# ATTACHMENT_DPI and recompressed.  If the message is still over its byte budget
+# the images are recompressed again at lower DPI/quality, largest first.  Other
+# files (PDF, DOCX) are attached as they are.  The before/after sizes go into
+# the email body.
+#
+# Image work is CPU bound, so it runs in a small process pool rather than on the
+# submission worker threads, which share the GIL with the Streamlit server.
+
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+# Raw attachment bytes per message; base64 adds a third on the wire, so this stays under 25 MB
+ATTACHMENT_BUDGET = int(os.environ.get('ATTACHMENT_BUDGET', str(18 * 1024 * 1024)))
+ATTACHMENT_DPI = int(os.environ.get('ATTACHMENT_DPI', '150'))
+ATTACHMENT_QUALITY = int(os.environ.get('ATTACHMENT_QUALITY', '80'))
+# Further (dpi, quality) steps tried while a message is over budget
+BUDGET_LEVELS = ((120, 70), (96, 60), (72, 50))
+
+A4_INCHES = (8.27, 11.69)
+IMAGE_FORMATS = ('JPEG', 'PNG')
+ATTACHMENT_WORKERS = int(os.environ.get('ATTACHMENT_WORKERS', '2'))
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+class AttachmentSize:
+    """Size of one attachment before and after optimisation."""
+
+    def __init__(self, name, original_bytes, final_bytes, image=False, note=''):
+        self.name = name
+        self.original_bytes = original_bytes
+        self.final_bytes = final_bytes
+        self.image = image
+        self.note = note
+
+
+class AttachmentReport:
+    """Before/after sizes of the attachments of one message."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.files = []
+
+    @property
+    def original_bytes(self):
+        return sum(f.original_bytes for f in self.files)
+
+    @property
+    def final_bytes(self):
+        return sum(f.final_bytes for f in self.files)
+
+    @property
+    def over_budget(self):
+        return self.final_bytes > self.budget
+
+    def summary_html(self):
+        lines = [f"- {f.name}: {format_size(f.original_bytes)} &rarr; {format_size(f.final_bytes)}"
+                 + (f" ({f.note})" if f.note else '') for f in self.files]
+        lines.append(f"Total: {format_size(self.original_bytes)} &rarr; {format_size(self.final_bytes)}"
+                     + (f" (over the {format_size(self.budget)} budget)" if self.over_budget else ''))
+        return "<br>".join(lines)
+
+
+def format_size(size):
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{size / 1024:.0f} KB"
+
+
+def _page_box(dpi):
+    short_side, long_side = (int(inches * dpi) for inches in A4_INCHES)
+    return short_side, long_side
+
+
+def recompress_image(data, dpi=ATTACHMENT_DPI, quality=ATTACHMENT_QUALITY):
+    """Return (bytes, format) for an upright, EXIF-free image fitted to an A4 page at dpi.
+
+    Returns None when data is not a JPEG or PNG image, or one that cannot be
+    recompressed, so the original bytes are kept.
+    """
+    try:
+        image = PILImage.open(io.BytesIO(data))
+        if image.format not in IMAGE_FORMATS:
+            return None
+        source_format = image.format
+        has_exif = bool(image.getexif())
+        image = ImageOps.exif_transpose(image)
+
+        short_side, long_side = _page_box(dpi)
+        box = (short_side, long_side) if image.height >= image.width else (long_side, short_side)
+        resized = image.width > box[0] or image.height > box[1]
+        if resized:
+            image.thumbnail(box, PILImage.LANCZOS)
+
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        output = io.BytesIO()
+        if source_format == 'PNG' and has_alpha:
+            image.save(output, format='PNG', optimize=True)
+            image_format = 'PNG'
+        else:
+            # Scans and photos compress far better as JPEG; no exif= argument, so the metadata is dropped
+            image.convert('L' if image.mode in ('L', 'LA', '1') else 'RGB').save(
+                output, format='JPEG', quality=quality, optimize=True, progressive=True)
+            image_format = 'JPEG'
+    except (OSError, ValueError, PILImage.DecompressionBombError) as e:
+        # Truncated files and modes PIL cannot convert or encode: the upload is sent as it is
+        print(f"Unable to recompress an image, keeping the original: {e}")
+        return None
+
+    if not resized and not has_exif and output.tell() >= len(data):
+        # Already small and carries no metadata: the upload is kept as it is
+        return data, source_format
+    return output.getvalue(), image_format
+
+
+def get_process_pool():
+    """Return the process pool for image work, starting it on first use."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn: forking the multi-threaded Streamlit server is not safe
+            _process_pool = ProcessPoolExecutor(max_workers=ATTACHMENT_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+
+def map_in_process_pool(function, items):
+    """Return [function(item) for item in items], computed in the process pool.
+
+    function must be a module-level function.  If the pool died (a worker was
+    killed), it is replaced and the work is done in this process instead.
+    """
+    global _process_pool
+    items = list(items)
+    if len(items) < 2:
+        return [function(item) for item in items]
+    pool = get_process_pool()
+    try:
+        return list(pool.map(function, items))
+    except BrokenProcessPool as e:
+        print(f"Attachment process pool failed ({e}), continuing in process")
+        with _process_pool_lock:
+            if _process_pool is pool:
+                _process_pool = None
+        return [function(item) for item in items]
+
+
+def _renamed(name, image_format):
+    root, ext = os.path.splitext(name)
+    if image_format == 'JPEG' and ext.lower() not in ('.jpg', '.jpeg'):
+        return f'{root}.jpg'
+    return name
+
+
+def optimise_attachments(files, budget=ATTACHMENT_BUDGET, reserved_bytes=0):
+    """Recompress the images among files, given as (file name, bytes) pairs, to fit budget.
+
+    reserved_bytes is taken off the budget for parts that cannot shrink, such as
+    the rendered form.  Returns (files, AttachmentReport); nothing is dropped, so
+    the result can still be over budget.
+    """
+    report = AttachmentReport(max(budget - reserved_bytes, 0))
+    optimised = []
+    results = map_in_process_pool(recompress_image, [data for _, data in files])
+    for (name, data), result in zip(files, results):
+        if result is None:
+            optimised.append((name, data))
+            report.files.append(AttachmentSize(name, len(data), len(data)))
+            continue
+        new_data, image_format = result
+        new_name = _renamed(name, image_format)
+        optimised.append((new_name, new_data))
+        report.files.append(AttachmentSize(new_name, len(data), len(new_data), image=True))
+
+    originals = [data for _, data in files]
+    for dpi, quality in BUDGET_LEVELS:
+        if not report.over_budget:
+            break
+        # Largest images first: they give back the most per step
+        for index in sorted(range(len(optimised)), key=lambda i: -report.files[i].final_bytes):
+            if not report.over_budget:
+                break
+            if not report.files[index].image:
+                continue
+            result = recompress_image(originals[index], dpi, quality)
+            if result is None or len(result[0]) >= report.files[index].final_bytes:
+                continue
+            name = _renamed(optimised[index][0], result[1])
+            optimised[index] = (name, result[0])
+            report.files[index].name = name
+            report.files[index].final_bytes = len(result[0])
+            report.files[index].note = f"{dpi} dpi, quality {quality}"
+
+    if report.over_budget:
+        print(f"Attachments still over budget: {report.final_bytes} > {report.budget} bytes")
+    return optimised, report
+
+
+# MIME headers of one attachment part (boundary, Content-Type, Content-Disposition, ...)
+PART_OVERHEAD = 512
+# Headers and body of a continuation message
+MESSAGE_OVERHEAD = 8 * 1024
+
+
+def encoded_size(size):
+    """Bytes an attachment of size bytes takes in the message: base64 in 76-character lines."""
+    base64_size = 4 * ((size + 2) // 3)
+    return base64_size + 2 * ((base64_size + 75) // 76) + PART_OVERHEAD
+
+
+def pack_attachments(files, limit, first_part_bytes):
+    """Bin-pack (file name, bytes) pairs into messages of at most limit bytes.
+
+    The first message already carries first_part_bytes (headers, body and the
+    form); the others only carry message_overhead.  Returns (parts, oversized):
+    parts is a list of file lists in upload order, the first possibly empty, and
+    oversized lists the files that cannot fit in any message on their own.
+    """
+    parts = [[]]
+    free = [limit - first_part_bytes]
+    oversized = []
+    # First fit decreasing: large files first, each into the first message with room
+    order = sorted(range(len(files)), key=lambda i: -len(files[i][1]))
+    placed = {}
+    for index in order:
+        size = encoded_size(len(files[index][1]))
+        if size > limit - MESSAGE_OVERHEAD:
+            oversized.append(files[index])
+            continue
+        for part, room in enumerate(free):
+            if size <= room:
+                break
+        else:
+            parts.append([])
+            free.append(limit - MESSAGE_OVERHEAD)
+            part = len(parts) - 1
+        free[part] -= size
+        placed[index] = part
+    for index in sorted(placed):
+        parts[placed[index]].append(files[index])
+    return parts, oversized
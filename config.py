@@ -0,0 +1,206 @@
+# Process-wide configuration of the ESFA form app.
+#
+# get_secret() used to call load_dotenv() on every lookup, parsing .env again
+# for each of the sender and partner addresses of a submission.  The
+# environment, the .env file and the Streamlit secrets files are now resolved
+# once into an immutable Config; get_config() hands out the current one and
+# builds a new one only when one of the files changed (checked at most every
+# CONFIG_CHECK_INTERVAL seconds), or when reload_config() is called.
+#
+# A key set in the environment wins over .env, which wins over secrets.toml,
+# as before.
+#
+# Config also owns the partner routing table, read from PARTNERS_FILE: one
+# entry per support option of step 1, in the order they are offered, with
+#
+#   recipients      addresses, or secret names holding them, that receive the
+#                   form on top of the sender
+#   subject         optional subject template; {partner}, {first_name},
+#                   {family_name}, {date} and {referral} are filled in
+#   digest_minutes  optional; send the partner one digest every so many
+#                   minutes instead of an email per submission
+#
+# The table is compiled into Partner objects keyed by option, with the
+# recipients resolved, when the Config is built.  A reload that fails (e.g. a
+# half-edited partners.json) keeps the previous Config.
+
+import json
+import os
+import string
+import threading
+import time
+import tomllib
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from dotenv import dotenv_values, find_dotenv
+
+# Where Streamlit reads st.secrets from; the project file wins over the global one
+SECRETS_FILES = (os.path.join(os.path.expanduser('~'), '.streamlit', 'secrets.toml'),
+                 os.path.join('.streamlit', 'secrets.toml'))
+# The files are checked for changes at most this often
+CONFIG_CHECK_INTERVAL = 5
+
+PARTNERS_FILE = os.environ.get('PARTNERS_FILE', 'partners.json')
+SUBJECT_FIELDS = ('partner', 'first_name', 'family_name', 'date', 'referral')
+DEFAULT_SUBJECT = 'ESFA: {partner} {first_name} {family_name} {date} {referral}'
+
+_config = None
+_checked = 0.0
+_config_lock = threading.Lock()
+
+
+@dataclass(frozen=True, slots=True)
+class Partner:
+    """Routing of the forms of one support option."""
+
+    name: str
+    # Partner addresses; the sender is added by Config.recipients()
+    recipients: tuple
+    subject_template: str = DEFAULT_SUBJECT
+    digest_minutes: Optional[int] = None
+
+    def subject(self, **fields):
+        return self.subject_template.format(partner=self.name, **fields)
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """One resolved view of the environment, .env and secrets, and the partner routing table."""
+
+    values: Mapping[str, str]
+    # support option -> Partner, in the order the options are offered
+    partners: Mapping[str, Partner]
+    # (path, mtime, size) of every file the values were read from
+    sources: tuple
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    @property
+    def partner_names(self):
+        return tuple(self.partners)
+
+    def partner(self, option):
+        """The Partner of support option; an unknown option is routed to the sender only."""
+        partner = self.partners.get(option)
+        if partner is None:
+            partner = Partner(option, ())
+        return partner
+
+    def recipients(self, option):
+        """The sender followed by the partner addresses of support option."""
+        return [self.values.get('sender_email'), *self.partner(option).recipients]
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def _dotenv_path():
+    return find_dotenv(usecwd=True) or os.path.abspath('.env')
+
+
+def _read_secrets(path):
+    try:
+        with open(path, 'rb') as f:
+            secrets = tomllib.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        print(f"Unable to read the secrets in {path}: {e}")
+        return {}
+    # Tables ([section]) are not used by the app; only top-level values are looked up by key
+    return {key: str(value) for key, value in secrets.items() if not isinstance(value, dict)}
+
+
+def _subject_template(template, name):
+    for _, field_name, _, _ in string.Formatter().parse(template):
+        if field_name is not None and field_name not in SUBJECT_FIELDS:
+            raise ValueError(f"Unknown field {{{field_name}}} in the subject of {name}")
+    return template
+
+
+def _partners(path, values):
+    with open(path, encoding='utf-8') as f:
+        table = json.load(f)
+    default_subject = _subject_template(table.get('subject', DEFAULT_SUBJECT), 'the partners')
+    partners = {}
+    unresolved = []
+    for entry in table['partners']:
+        name = entry['name']
+        addresses = []
+        for recipient in entry.get('recipients', ()):
+            if '@' in recipient:
+                addresses.append(recipient)
+            elif values.get(recipient):
+                addresses.append(values[recipient])
+            else:
+                unresolved.append(recipient)
+        digest_minutes = entry.get('digest_minutes')
+        if digest_minutes is not None and (not isinstance(digest_minutes, int) or digest_minutes <= 0):
+            raise ValueError(f"digest_minutes of {name} must be a positive number of minutes")
+        partners[name] = Partner(name, tuple(addresses),
+                                 _subject_template(entry.get('subject', default_subject), name), digest_minutes)
+    if unresolved:
+        # Forms of these partners only go to the sender until the secrets are set
+        print(f"Partner recipients not configured: {', '.join(unresolved)}")
+    return partners
+
+
+def load_config():
+    """Resolve the configuration from the secrets files, .env and the environment."""
+    dotenv_path = _dotenv_path()
+    # .env stays last, see _changed()
+    paths = (PARTNERS_FILE, *SECRETS_FILES, dotenv_path)
+    # Taken before reading, so a change made while reading is picked up by the next check
+    sources = tuple(_file_state(path) for path in paths)
+    values = {}
+    for path in SECRETS_FILES:
+        values.update(_read_secrets(path))
+    if os.path.isfile(dotenv_path):
+        values.update((key, value) for key, value in dotenv_values(dotenv_path).items() if value is not None)
+    values.update(os.environ)
+    return Config(MappingProxyType(values), MappingProxyType(_partners(PARTNERS_FILE, values)), sources)
+
+
+def _changed(config):
+    # The .env in use can also change, e.g. one created next to the app after startup
+    return (any(_file_state(state[0]) != state for state in config.sources)
+            or config.sources[-1][0] != _dotenv_path())
+
+
+def get_config():
+    """Return the current Config, reloading it if one of its files changed."""
+    global _config, _checked
+    config = _config
+    now = time.monotonic()
+    if config is not None and now - _checked < CONFIG_CHECK_INTERVAL:
+        return config
+    with _config_lock:
+        if _config is None:
+            _config = load_config()
+        elif _changed(_config):
+            print("Configuration files changed, reloading")
+            try:
+                _config = load_config()
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Unable to reload the configuration, keeping the previous one: {e}")
+                # Not retried until the files change again
+                _config = replace(_config, sources=tuple(_file_state(state[0]) for state in _config.sources))
+        _checked = now
+        return _config
+
+
+def reload_config():
+    """Resolve the configuration again now, e.g. after the environment was changed."""
+    global _config, _checked
+    with _config_lock:
+        _config = load_config()
+        _checked = time.monotonic()
+        return _config
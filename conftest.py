@@ -0,0 +1 @@
+# Lets the tests under tests/ import the app modules from the repository root.
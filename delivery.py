@@ -0,0 +1,184 @@
+# Throttled delivery for the ESFA form emails.
+#
+# Office 365 limits how many messages and recipients one mailbox may submit per
+# minute; during enrolment events a burst of submissions used to run straight
+# into those limits and fail.  Every send now passes through a scheduler that
+# takes tokens from two buckets (messages and recipients per minute), so bursts
+# are spread out instead of rejected.  Transient failures (4xx replies, dropped
+# sessions) are retried with exponential backoff via tenacity.
+#
+# Each partner's messages go through a delivery lane of their own: a single
+# thread that sends them in order.  A partner whose mailbox keeps answering
+# "try again later" only holds up its own lane while it is retried, not the
+# forms of the other partners; all lanes share the scheduler's rate limits.
+
+import os
+import re
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential
+
+from mailer import is_connection_error
+
+SMTP_MESSAGES_PER_MINUTE = float(os.environ.get('SMTP_MESSAGES_PER_MINUTE', '30'))
+SMTP_RECIPIENTS_PER_MINUTE = float(os.environ.get('SMTP_RECIPIENTS_PER_MINUTE', '120'))
+DELIVERY_ATTEMPTS = int(os.environ.get('DELIVERY_ATTEMPTS', '5'))
+# Seconds a submission waits for its lane before leaving the message to it
+DELIVERY_LANE_WAIT = int(os.environ.get('DELIVERY_LANE_WAIT', '30'))
+# Backoff between attempts: 2, 4, 8, ... seconds, capped
+DELIVERY_BACKOFF_MAX = 120
+
+# Lane of messages that belong to no partner
+DEFAULT_LANE = 'default'
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+_lanes = {}
+_lanes_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate_per_minute, holding at most capacity tokens."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(rate_per_minute, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, count=1):
+        """Take count tokens, possibly going into debt, and return how long to wait before using them."""
+        # A request larger than the bucket can never be covered; it drains a full bucket instead
+        count = min(count, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= count
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class DeliveryStats:
+    """Queue depth and throttle wait times of the delivery scheduler."""
+
+    def __init__(self):
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    @property
+    def average_wait(self):
+        deliveries = self.sent + self.failed
+        return self.total_wait / deliveries if deliveries else 0.0
+
+    def as_dict(self):
+        return {'queue_depth': self.queue_depth, 'max_queue_depth': self.max_queue_depth,
+                'sent': self.sent, 'failed': self.failed, 'retries': self.retries,
+                'average_wait': round(self.average_wait, 3), 'max_wait': round(self.max_wait, 3),
+                'last_wait': round(self.last_wait, 3)}
+
+
+def is_transient_error(error):
+    """True for failures worth retrying: dropped sessions and 4xx (try again later) replies."""
+    if is_connection_error(error):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+
+class DeliveryScheduler:
+    """Spreads sends over the provider's per-minute limits and retries transient failures."""
+
+    def __init__(self, messages_per_minute=SMTP_MESSAGES_PER_MINUTE,
+                 recipients_per_minute=SMTP_RECIPIENTS_PER_MINUTE, attempts=DELIVERY_ATTEMPTS):
+        self.messages = TokenBucket(messages_per_minute)
+        self.recipients = TokenBucket(recipients_per_minute)
+        self.attempts = attempts
+        self.stats = DeliveryStats()
+        self._lock = threading.Lock()
+
+    def _throttle(self, recipient_count):
+        # Both buckets are charged up front, so concurrent senders queue up in order
+        wait = max(self.messages.reserve(1), self.recipients.reserve(recipient_count))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def _before_retry(self, retry_state):
+        with self._lock:
+            self.stats.retries += 1
+        print(f"Delivery attempt {retry_state.attempt_number} failed "
+              f"({retry_state.outcome.exception()}), retrying in {retry_state.next_action.sleep:.0f}s")
+
+    def deliver(self, send, recipient_count=1):
+        """Call send() once the rate limits allow it, retrying transient failures; return its result."""
+        with self._lock:
+            self.stats.queue_depth += 1
+            self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+        waited = 0.0
+        try:
+            retrying = Retrying(stop=stop_after_attempt(self.attempts),
+                                wait=wait_exponential(multiplier=2, min=2, max=DELIVERY_BACKOFF_MAX),
+                                retry=retry_if_exception(is_transient_error),
+                                before_sleep=self._before_retry, reraise=True)
+            for attempt in retrying:
+                with attempt:
+                    waited += self._throttle(recipient_count)
+                    result = send()
+        except Exception:
+            self._record(waited, failed=True)
+            raise
+        self._record(waited)
+        return result
+
+    def _record(self, waited, failed=False):
+        with self._lock:
+            self.stats.queue_depth -= 1
+            if failed:
+                self.stats.failed += 1
+            else:
+                self.stats.sent += 1
+            self.stats.total_wait += waited
+            self.stats.max_wait = max(self.stats.max_wait, waited)
+            self.stats.last_wait = waited
+
+    def metrics(self):
+        with self._lock:
+            return self.stats.as_dict()
+
+
+def get_delivery_scheduler():
+    """Return the process-wide delivery scheduler, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = DeliveryScheduler()
+        return _scheduler
+
+
+def get_delivery_lane(name=None):
+    """Return the single-threaded executor delivering the messages of partner name, creating it on first use."""
+    name = name or DEFAULT_LANE
+    with _lanes_lock:
+        lane = _lanes.get(name)
+        if lane is None:
+            slug = re.sub(r'\W+', '-', name).strip('-').lower()
+            lane = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'delivery-{slug}')
+            _lanes[name] = lane
+        return lane
@@ -0,0 +1,244 @@
+# Digest delivery for high-volume partners.
+#
+# A partner with digest_minutes in partners.json does not get an email per
+# submission.  The rendered form and the (already optimised) evidence of each
+# submission are spooled under DIGEST_DIR/<partner>/<job id>/, entry.json
+# written last, and a sender thread emails each partner one digest once its
+# oldest waiting submission is digest_minutes old: a zip of the forms and
+# evidence, one folder per submission, and a summary table in the body.
+# Zips are cut at DIGEST_ZIP_BUDGET, so a busy day becomes a few attachments
+# the outbox can still split over several messages.
+#
+# The digest is keyed by the submissions it carries, so a digest spooled in the
+# outbox just before a crash is not sent twice; the spooled submissions are
+# only deleted once their digest is in the outbox.
+
+import csv
+import hashlib
+import html
+import io
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+from attachments import ATTACHMENT_BUDGET
+from config import get_config
+
+DIGEST_DIR = os.environ.get('DIGEST_DIR', '.digests')
+DIGEST_CHECK_INTERVAL = 60
+# Raw bytes per zip; a digest over this is sent as several zips
+DIGEST_ZIP_BUDGET = int(os.environ.get('DIGEST_ZIP_BUDGET', str(ATTACHMENT_BUDGET)))
+
+ENTRY_FILE = 'entry.json'
+FILES_DIR = 'files'
+
+_senders = {}
+_senders_lock = threading.Lock()
+
+
+def _slug(name):
+    return re.sub(r'\W+', '-', name).strip('-').lower() or 'partner'
+
+
+def _write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def spool_submission(partner, job_id, row, document_name, document_data, files, digest_dir=None):
+    """Keep a submission for the next digest of partner.
+
+    row holds the summary fields of the submission (reference, learner,
+    subject); files are the (file name, bytes) attachments of its email.
+    """
+    entry_dir = os.path.join(digest_dir or DIGEST_DIR, _slug(partner), job_id)
+    files_dir = os.path.join(entry_dir, FILES_DIR)
+    os.makedirs(files_dir, exist_ok=True)
+    names = []
+    for name, data in ([(document_name, document_data)] if document_data else []) + list(files):
+        # Unique within the submission; shown as is inside its zip folder
+        root, ext = os.path.splitext(name)
+        unique, counter = name, 2
+        while unique in names:
+            unique = f'{root} ({counter}){ext}'
+            counter += 1
+        names.append(unique)
+        _write_file(os.path.join(files_dir, f'{len(names) - 1:03d}'), data)
+    entry = dict(row, partner=partner, job_id=job_id, files=names, created=time.time())
+    # entry.json is written last: a directory without it is an incomplete submission
+    tmp_path = os.path.join(entry_dir, f'{ENTRY_FILE}.tmp')
+    _write_file(tmp_path, json.dumps(entry, indent=1).encode('utf-8'))
+    os.replace(tmp_path, os.path.join(entry_dir, ENTRY_FILE))
+    print(f"Submission {job_id} kept for the {partner} digest ({len(names)} file(s))")
+
+
+def pending_digests(digest_dir=None):
+    """{partner: [entry, ...]} of the spooled submissions, oldest first; each entry knows its directory."""
+    digest_dir = digest_dir or DIGEST_DIR
+    if not os.path.isdir(digest_dir):
+        return {}
+    pending = {}
+    for lane in os.listdir(digest_dir):
+        lane_dir = os.path.join(digest_dir, lane)
+        if not os.path.isdir(lane_dir):
+            continue
+        for job_id in os.listdir(lane_dir):
+            entry_dir = os.path.join(lane_dir, job_id)
+            try:
+                with open(os.path.join(entry_dir, ENTRY_FILE), encoding='utf-8') as f:
+                    entry = json.load(f)
+            except FileNotFoundError:
+                continue
+            except ValueError as e:
+                print(f"Skipping unreadable digest entry {entry_dir}: {e}")
+                continue
+            entry['dir'] = entry_dir
+            pending.setdefault(entry['partner'], []).append(entry)
+    for entries in pending.values():
+        entries.sort(key=lambda entry: entry['created'])
+    return pending
+
+
+def _entry_files(entry):
+    files_dir = os.path.join(entry['dir'], FILES_DIR)
+    for index, name in enumerate(entry['files']):
+        yield name, os.path.join(files_dir, f'{index:03d}')
+
+
+def _folder_name(index, entry):
+    return re.sub(r'[<>:"/\\|?*]', '', f"{index:02d} {entry.get('learner') or entry['reference']}").strip()
+
+
+def summary_csv(entries):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Submitted', 'Learner', 'Reference', 'Subject', 'Files'])
+    for entry in entries:
+        writer.writerow([datetime.fromtimestamp(entry['created']).strftime('%d-%m-%Y %H:%M'),
+                         entry.get('learner', ''), entry['reference'], entry.get('subject', ''),
+                         '; '.join(entry['files'])])
+    return output.getvalue().encode('utf-8')
+
+
+def summary_html(entries, zip_names):
+    """The digest body: one table row per submission, with the zip that carries it."""
+    rows = "".join(
+        f"<tr><td>{datetime.fromtimestamp(entry['created']).strftime('%d-%m-%Y %H:%M')}</td>"
+        f"<td>{html.escape(entry.get('learner', ''))}</td><td>{html.escape(entry['reference'])}</td>"
+        f"<td>{len(entry['files'])}</td><td>{html.escape(zip_names[entry['job_id']])}</td></tr>"
+        for entry in entries)
+    return f'''
+        <p>ESFA Form digest: {len(entries)} submission(s). The forms and evidence are in the attached zip file(s), one folder per submission.</p>
+
+        <table border="1" cellpadding="4" cellspacing="0">
+        <tr><th>Submitted</th><th>Learner</th><th>Reference</th><th>Files</th><th>Zip</th></tr>
+        {rows}
+        </table>
+
+        <p>Thank you.</p>
+        '''
+
+
+def build_digest(partner, entries, budget=None):
+    """Return (zip files as (file name, bytes) pairs, HTML body) for the digest of entries.
+
+    A new zip is started whenever the next submission would take the current one
+    over budget; a submission is never split over two zips.
+    """
+    budget = budget or DIGEST_ZIP_BUDGET
+    stem = f"ESFA {partner} {datetime.now().strftime('%Y-%m-%d %H%M')}"
+    groups = [[]]
+    group_bytes = 0
+    for index, entry in enumerate(entries, 1):
+        size = sum(os.path.getsize(path) for _, path in _entry_files(entry))
+        if groups[-1] and group_bytes + size > budget:
+            groups.append([])
+            group_bytes = 0
+        groups[-1].append((index, entry))
+        group_bytes += size
+
+    zips = []
+    zip_names = {}
+    for number, group in enumerate(groups, 1):
+        name = f'{stem}.zip' if len(groups) == 1 else f'{stem} ({number} of {len(groups)}).zip'
+        output = io.BytesIO()
+        # The forms, PDFs and JPEGs are compressed already; only the summary is deflated
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+            archive.writestr('summary.csv', summary_csv([entry for _, entry in group]),
+                             compress_type=zipfile.ZIP_DEFLATED)
+            for index, entry in group:
+                folder = _folder_name(index, entry)
+                for file_name, path in _entry_files(entry):
+                    archive.write(path, f'{folder}/{file_name}')
+                zip_names[entry['job_id']] = name
+        zips.append((name, output.getvalue()))
+    return zips, summary_html(entries, zip_names)
+
+
+def _digest_key(entries):
+    digest = hashlib.blake2b(digest_size=10)
+    for job_id in sorted(entry['job_id'] for entry in entries):
+        digest.update(job_id.encode('ascii'))
+    return f'digest-{digest.hexdigest()}'
+
+
+def flush_digests(send, digest_dir=None, force=False):
+    """Send the digests that are due; return how many were sent.
+
+    A partner's digest is due once its oldest submission is digest_minutes old,
+    or straight away when the partner is no longer in digest mode.
+    send(partner, key, subject, body, files) must spool the email durably; the
+    submissions are deleted once it returns.
+    """
+    config = get_config()
+    now = time.time()
+    sent = 0
+    for partner, entries in pending_digests(digest_dir).items():
+        minutes = config.partner(partner).digest_minutes
+        if not force and minutes and now - entries[0]['created'] < minutes * 60:
+            continue
+        try:
+            zips, body = build_digest(partner, entries)
+            subject = f"ESFA digest: {partner} {datetime.now().strftime('%d-%m-%Y %H:%M')} ({len(entries)} submission(s))"
+            send(partner, _digest_key(entries), subject, body, zips)
+        except Exception as e:
+            # Kept for the next round; the other partners' digests still go out
+            print(f"Unable to send the {partner} digest: {e}")
+            continue
+        for entry in entries:
+            shutil.rmtree(entry['dir'], ignore_errors=True)
+        print(f"Sent the {partner} digest: {len(entries)} submission(s) in {len(zips)} zip(s)")
+        sent += 1
+    return sent
+
+
+class _DigestSender(threading.Thread):
+    def __init__(self, send, digest_dir, interval):
+        super().__init__(name='digest-sender', daemon=True)
+        self.send = send
+        self.digest_dir = digest_dir
+        self.interval = interval
+
+    def run(self):
+        while True:
+            try:
+                flush_digests(self.send, self.digest_dir)
+            except Exception as e:
+                print(f"Digest delivery failed: {e}")
+            time.sleep(self.interval)
+
+
+def start_digest_sender(send, digest_dir=None, interval=None):
+    """Start the background digest sender for digest_dir once per process."""
+    digest_dir = os.path.abspath(digest_dir or DIGEST_DIR)
+    with _senders_lock:
+        if digest_dir not in _senders:
+            sender = _DigestSender(send, digest_dir, interval or DIGEST_CHECK_INTERVAL)
+            _senders[digest_dir] = sender
+            sender.start()
+    return _senders[digest_dir]
@@ -0,0 +1,239 @@
+# Zip-level output engine for the ESFA Word templates.
+#
+# python-docx inflates every part of the package on load and deflates all of
+# them again on save, including the large word/media images that never change.
+# This engine streams the template zip instead: unchanged entries are copied
+# as raw compressed bytes, and only word/document.xml, its relationships, the
+# content types and the new signature images are regenerated.
+
+import hashlib
+import io
+import struct
+import threading
+import weakref
+import zipfile
+import zlib
+
+from lxml import etree
+
+from docx.image.image import Image
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.parser import parse_xml
+from docx.oxml.shape import CT_Inline
+from docx.shared import Inches
+
+from docx_template import (convert_to_str, get_compiled_template, report_missing_values, template_paragraphs,
+                           write_slots)
+
+DOCUMENT_PART = 'word/document.xml'
+DOCUMENT_RELS_PART = 'word/_rels/document.xml.rels'
+CONTENT_TYPES_PART = '[Content_Types].xml'
+REGENERATED_PARTS = (DOCUMENT_PART, DOCUMENT_RELS_PART, CONTENT_TYPES_PART)
+
+PACKAGE_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+CONTENT_TYPES_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+
+SIGNATURE_WIDTH = Inches(2)
+
+_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+_CENTRAL_HEADER = struct.Struct('<4s6H3L5H2L')
+_END_RECORD = struct.Struct('<4s4H2LH')
+
+_packages = weakref.WeakKeyDictionary()
+_package_lock = threading.Lock()
+
+
+class TemplatePackage:
+    """Raw zip entries of a template, read once and shared by every render."""
+
+    def __init__(self, template_bytes):
+        self.entries = []   # (ZipInfo, raw compressed bytes)
+        self.parts = {}     # regenerated parts, decompressed
+        with zipfile.ZipFile(io.BytesIO(template_bytes)) as zf:
+            for info in zf.infolist():
+                if info.filename in REGENERATED_PARTS:
+                    self.parts[info.filename] = zf.read(info.filename)
+                self.entries.append((info, _read_raw_entry(template_bytes, info)))
+
+        self.media_names = {info.filename for info, _ in self.entries if info.filename.startswith('word/media/')}
+        # Same rule as python-docx: new shape ids start above the largest id in the document
+        ids = etree.fromstring(self.parts[DOCUMENT_PART]).xpath('//@id')
+        self.next_shape_id = max([int(i) for i in ids if i.isdigit()] + [0]) + 1
+
+
+def _read_raw_entry(data, info):
+    # The local header may carry a different extra field than the central directory
+    header = _LOCAL_HEADER.unpack_from(data, info.header_offset)
+    name_length, extra_length = header[-2], header[-1]
+    start = info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+    return data[start:start + info.compress_size]
+
+
+def get_template_package(template_file):
+    """Return (compiled template, package) for template_file; the package follows template changes."""
+    compiled = get_compiled_template(template_file)
+    package = _packages.get(compiled)
+    if package is None:
+        with _package_lock:
+            package = _packages.get(compiled)
+            if package is None:
+                package = TemplatePackage(compiled.template_bytes)
+                _packages[compiled] = package
+    return compiled, package
+
+
+class _ZipStreamWriter:
+    """Minimal zip writer that accepts already-compressed entry data."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.central_directory = []
+
+    def write_raw(self, info, raw_data):
+        self._write_entry(info.filename, info.compress_type, info.date_time, info.CRC,
+                          info.compress_size, info.file_size, raw_data)
+
+    def write_bytes(self, filename, data, date_time=(1980, 1, 1, 0, 0, 0)):
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        raw_data = compressor.compress(data) + compressor.flush()
+        self._write_entry(filename, zipfile.ZIP_DEFLATED, date_time, zlib.crc32(data),
+                          len(raw_data), len(data), raw_data)
+
+    def _write_entry(self, filename, compress_type, date_time, crc, compress_size, file_size, raw_data):
+        name = filename.encode('utf-8')
+        flags = 0 if filename.isascii() else 0x800
+        dos_time = (date_time[3] << 11) | (date_time[4] << 5) | (date_time[5] // 2)
+        dos_date = ((date_time[0] - 1980) << 9) | (date_time[1] << 5) | date_time[2]
+        offset = self.fileobj.tell()
+        self.fileobj.write(_LOCAL_HEADER.pack(b'PK\x03\x04', 20, flags, compress_type, dos_time, dos_date,
+                                              crc, compress_size, file_size, len(name), 0))
+        self.fileobj.write(name)
+        self.fileobj.write(raw_data)
+        self.central_directory.append(_CENTRAL_HEADER.pack(
+            b'PK\x01\x02', 20, 20, flags, compress_type, dos_time, dos_date, crc, compress_size, file_size,
+            len(name), 0, 0, 0, 0, 0, offset) + name)
+
+    def close(self):
+        start = self.fileobj.tell()
+        for record in self.central_directory:
+            self.fileobj.write(record)
+        size = self.fileobj.tell() - start
+        count = len(self.central_directory)
+        self.fileobj.write(_END_RECORD.pack(b'PK\x05\x06', 0, 0, count, count, size, start, 0))
+
+
+def _read_image_blob(image):
+    # Signature images arrive as a file path, raw bytes or a file-like object
+    if isinstance(image, str):
+        with open(image, 'rb') as f:
+            return f.read()
+    if isinstance(image, bytes):
+        return image
+    image.seek(0)
+    return image.read()
+
+
+def _next_media_name(existing, extension):
+    index = 1
+    while f'word/media/image{index}.{extension}' in existing:
+        index += 1
+    return f'word/media/image{index}.{extension}'
+
+
+def _add_relationships(rels_xml, targets):
+    root = etree.fromstring(rels_xml)
+    used = {rel.get('Id') for rel in root}
+    rel_ids = {}
+    number = 1
+    for key, target in targets.items():
+        while f'rId{number}' in used:
+            number += 1
+        rel_id = f'rId{number}'
+        used.add(rel_id)
+        etree.SubElement(root, f'{{{PACKAGE_RELS_NS}}}Relationship', Id=rel_id, Type=RT.IMAGE, Target=target)
+        rel_ids[key] = rel_id
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True), rel_ids
+
+
+def _ensure_default_content_types(types_xml, images):
+    root = etree.fromstring(types_xml)
+    known = {default.get('Extension', '').lower() for default in root.iter(f'{{{CONTENT_TYPES_NS}}}Default')}
+    changed = False
+    for image in images:
+        if image.ext.lower() not in known:
+            root.insert(0, etree.Element(f'{{{CONTENT_TYPES_NS}}}Default', Extension=image.ext,
+                                         ContentType=image.content_type))
+            known.add(image.ext.lower())
+            changed = True
+    if not changed:
+        return types_xml
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+def render_document_stream(template_file, placeholder_values, signature_images):
+    """Render template_file by streaming its zip and return the filled .docx as a BytesIO.
+
+    Same output as docx_template.render_document, but only the document XML, its
+    relationships, the content types and the signature images are (re)compressed.
+    Raises ValueError when a signature slot has no image or its image cannot be read.
+    """
+    compiled, package = get_template_package(template_file)
+
+    document = parse_xml(package.parts[DOCUMENT_PART])
+    paragraphs = template_paragraphs(document)
+    values = {key: convert_to_str(value) for key, value in placeholder_values.items()}
+    report_missing_values(compiled, values)
+
+    signature_runs = write_slots(compiled, paragraphs, values)
+
+    # Identical signature images share one media part, as python-docx does
+    media = {}        # sha1 -> (media name, Image)
+    slot_images = []  # (run, sha1)
+    for run, signature_key in signature_runs:
+        # A form without its signatures is not valid, so an unfilled slot fails the render
+        image = signature_images.get(signature_key)
+        if image is None:
+            raise ValueError(f"No signature image for {signature_key}")
+        try:
+            blob = _read_image_blob(image)
+            sha1 = hashlib.sha1(blob).hexdigest()
+            if sha1 not in media:
+                taken = package.media_names | {name for name, _ in media.values()}
+                docx_image = Image.from_blob(blob)
+                media[sha1] = (_next_media_name(taken, docx_image.ext), docx_image)
+        except Exception as e:
+            raise ValueError(f"The signature image for {signature_key} could not be read: {e}") from e
+        slot_images.append((run, sha1))
+
+    rels_xml, rel_ids = _add_relationships(
+        package.parts[DOCUMENT_RELS_PART],
+        {sha1: name[len('word/'):] for sha1, (name, _) in media.items()})
+
+    shape_id = package.next_shape_id
+    for run, sha1 in slot_images:
+        name, docx_image = media[sha1]
+        cx, cy = docx_image.scaled_dimensions(SIGNATURE_WIDTH, None)
+        inline = CT_Inline.new_pic_inline(shape_id, rel_ids[sha1], docx_image.filename, cx, cy)
+        run._r.add_drawing(inline)
+        shape_id += 1
+
+    regenerated = {
+        DOCUMENT_PART: etree.tostring(document, xml_declaration=True, encoding='UTF-8', standalone=True),
+        DOCUMENT_RELS_PART: rels_xml,
+        CONTENT_TYPES_PART: _ensure_default_content_types(
+            package.parts[CONTENT_TYPES_PART], [docx_image for _, docx_image in media.values()]),
+    }
+
+    output = io.BytesIO()
+    writer = _ZipStreamWriter(output)
+    for info, raw_data in package.entries:
+        if info.filename in regenerated:
+            writer.write_bytes(info.filename, regenerated[info.filename], info.date_time)
+        else:
+            writer.write_raw(info, raw_data)
+    for name, docx_image in media.values():
+        writer.write_bytes(name, docx_image.blob)
+    writer.close()
+
+    output.seek(0)
+    return output
@@ -0,0 +1,438 @@
+# Compiled placeholder index for the ESFA Word templates.
+#
+# The template is parsed once per process and every paragraph holding a pN
+# placeholder (or one of the signature slots) is recorded by its position in
+# the document.  Rendering a submission then only touches those paragraphs
+# instead of re-walking every paragraph, table, row, cell and run.
+#
+# The template bytes are kept with the index, so a submission is rendered from
+# memory into a BytesIO without copying the template or touching the disk.
+#
+# While compiling, runs are merged so that every placeholder sits inside one
+# run.  A render then writes each value into its run in a single pass and the
+# template's run formatting survives.
+#
+# Compiled artefacts are also kept on disk under the SHA-256 of the template,
+# so restarted or newly scaled workers skip the compile step.
+
+import hashlib
+import io
+import json
+import os
+import threading
+from datetime import date
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.shared import Inches
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+
+SIGNATURE_PLACEHOLDERS = ('p230', 'p234')
+
+W_BODY = qn('w:body')
+W_P = qn('w:p')
+W_TBL = qn('w:tbl')
+W_TBL_GRID = qn('w:tblGrid')
+W_GRID_COL = qn('w:gridCol')
+W_TR = qn('w:tr')
+W_TC = qn('w:tc')
+W_SDT = qn('w:sdt')
+W_SDT_CONTENT = qn('w:sdtContent')
+W_R = qn('w:r')
+W_BR = qn('w:br')
+PLAIN_RUN_CHILDREN = {qn('w:rPr'), qn('w:t'), qn('w:tab'), W_BR}
+
+# Compiled artefacts shared by every worker process, keyed by template content hash
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', '.template_cache')
+CACHE_FORMAT_VERSION = 1
+
+_compiled_templates = {}
+_compile_lock = threading.Lock()
+
+
+class CompiledTemplate:
+    """Locations of every placeholder in a normalised template, found once per process."""
+
+    def __init__(self, template_file, template_bytes, text_slots, signature_slots):
+        self.template_file = template_file
+        # The run-normalised template, not the file on disk
+        self.template_bytes = template_bytes
+        # (paragraph index, run index, segments) - segments alternate literal text and placeholder
+        # keys; run index None means the placeholder could not be isolated in a run and the whole
+        # paragraph text is rewritten instead
+        self.text_slots = text_slots
+        # (paragraph index, run index, segments, signature key)
+        self.signature_slots = signature_slots
+
+    @property
+    def placeholders(self):
+        keys = set()
+        for slot in self.text_slots + self.signature_slots:
+            keys.update(slot[2][1::2])
+        return keys
+
+    def missing_values(self, placeholder_values):
+        """Placeholders present in the template that placeholder_values has no value for."""
+        return sorted(self.placeholders - set(placeholder_values) - set(SIGNATURE_PLACEHOLDERS))
+
+
+def _is_word_char(char):
+    # Same characters as \w, so tokens match the old r'\bp\d+[a-z]?\b' placeholders exactly
+    return char.isalnum() or char == '_'
+
+
+def tokenize_placeholders(text):
+    """Split text into segments alternating literal text and p<digits><suffix> placeholder keys.
+
+    A single left-to-right scan: every character is looked at a constant number of
+    times, so the cost is linear in len(text) whatever the text contains.
+    """
+    segments = []
+    literal_start = 0
+    length = len(text)
+    i = text.find('p')
+    while i != -1:
+        end = i + 1
+        if i == 0 or not _is_word_char(text[i - 1]):
+            while end < length and text[end].isdigit():
+                end += 1
+            if end > i + 1:
+                if end < length and 'a' <= text[end] <= 'z':
+                    end += 1
+                if end == length or not _is_word_char(text[end]):
+                    segments.append(text[literal_start:i])
+                    segments.append(text[i:end])
+                    literal_start = end
+        i = text.find('p', end)
+    segments.append(text[literal_start:])
+    return segments
+
+
+def convert_to_str(value):
+    # Convert value to string, handling datetime.date objects
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+
+class TraversalStats:
+    """Cell visit counts for one walk, compared with python-docx's table.rows -> row.cells."""
+
+    def __init__(self):
+        self.tables = 0
+        self.cell_visits = 0
+        # row.cells returns the same w:tc again for every grid column / row a merged cell spans
+        self.row_cells_visits = 0
+
+    @property
+    def saved_visits(self):
+        return self.row_cells_visits - self.cell_visits
+
+
+def _iter_cells(tr):
+    for child in tr.iterchildren(W_TC, W_SDT):
+        if child.tag == W_TC:
+            yield child
+        else:
+            content = child.find(W_SDT_CONTENT)
+            if content is not None:
+                yield from _iter_cells(content)
+
+
+def iter_paragraphs(container, stats=None):
+    """Yield every w:p of a block container (w:body, w:tc) in document order.
+
+    Each table cell is visited once per underlying w:tc element however many grid
+    columns or rows its merge spans, and nested tables are walked recursively.
+    """
+    for child in container.iterchildren(W_P, W_TBL, W_SDT):
+        if child.tag == W_P:
+            yield child
+        elif child.tag == W_TBL:
+            rows = child.findall(W_TR)
+            if stats is not None:
+                stats.tables += 1
+                stats.row_cells_visits += len(rows) * len(child.findall(f'{W_TBL_GRID}/{W_GRID_COL}'))
+            for tr in rows:
+                for tc in _iter_cells(tr):
+                    if stats is not None:
+                        stats.cell_visits += 1
+                    yield from iter_paragraphs(tc, stats)
+        else:
+            content = child.find(W_SDT_CONTENT)
+            if content is not None:
+                yield from iter_paragraphs(content, stats)
+
+
+def template_paragraphs(document):
+    """All w:p elements under the w:body of a document element, in document order."""
+    return list(document.find(W_BODY).iter(W_P))
+
+
+def _is_plain_text_run(r):
+    # Runs whose whole content round-trips through Run.text (no fields, drawings or page breaks)
+    for child in r:
+        if child.tag == W_BR and child.get(qn('w:type')) not in (None, 'textWrapping'):
+            return False
+        if child.tag not in PLAIN_RUN_CHILDREN:
+            return False
+    return True
+
+
+def normalise_runs(p):
+    """Merge run text so every placeholder in paragraph p sits inside a single run.
+
+    Word often splits a token such as p60z over several runs ('p6' + '0z').  The
+    characters of a split token are moved into the run where the token starts, so
+    that run's formatting applies to the whole value.  Returns the list of runs, or
+    None if the paragraph's placeholders cannot be isolated in plain text runs.
+    """
+    runs = p.findall(W_R)
+    texts = [Run(r, None).text for r in runs]
+    full_text = ''.join(texts)
+    if tokenize_placeholders(full_text)[1::2] != tokenize_placeholders(Paragraph(p, None).text)[1::2]:
+        # Placeholders inside hyperlinks or other inline containers
+        return None
+
+    owners = [i for i, text in enumerate(texts) for _ in text]
+    position = 0
+    for i, segment in enumerate(tokenize_placeholders(full_text)):
+        if i % 2 == 1:
+            for k in range(position + 1, position + len(segment)):
+                owners[k] = owners[position]
+        position += len(segment)
+
+    merged_texts = [''] * len(runs)
+    for char, owner in zip(full_text, owners):
+        merged_texts[owner] += char
+
+    for r, text, merged_text in zip(runs, texts, merged_texts):
+        if text != merged_text and not _is_plain_text_run(r):
+            return None
+    kept_runs = []
+    for r, text, merged_text in zip(runs, texts, merged_texts):
+        if text == merged_text:
+            kept_runs.append(r)
+        elif merged_text:
+            Run(r, None).text = merged_text
+            kept_runs.append(r)
+        else:
+            p.remove(r)
+    return kept_runs
+
+
+def compile_template(template_file, template_bytes):
+    doc = Document(io.BytesIO(template_bytes))
+    text_slots = []
+    signature_slots = []
+    normalised = 0
+
+    # Slots are stored as positions in template_paragraphs(), which a render can rebuild cheaply
+    paragraph_index = {p: i for i, p in enumerate(template_paragraphs(doc.element))}
+    stats = TraversalStats()
+    for p in iter_paragraphs(doc.element.body, stats):
+        index = paragraph_index[p]
+        text = Paragraph(p, None).text
+        if len(tokenize_placeholders(text)) == 1:
+            continue
+
+        runs = normalise_runs(p)
+        if runs is None:
+            targets = [(None, tokenize_placeholders(text))]
+        else:
+            normalised += 1
+            targets = [(run_index, tokenize_placeholders(Run(r, None).text)) for run_index, r in enumerate(runs)]
+
+        for run_index, segments in targets:
+            if len(segments) == 1:
+                continue
+            signature_key = next((key for key in SIGNATURE_PLACEHOLDERS if key in segments[1::2]), None)
+            if signature_key:
+                signature_slots.append((index, run_index, segments, signature_key))
+            else:
+                text_slots.append((index, run_index, segments))
+
+    # The normalised package is what every render starts from
+    output = io.BytesIO()
+    doc.save(output)
+
+    print(f"Compiled template '{template_file}': {len(text_slots)} placeholder runs, "
+          f"{len(signature_slots)} signature slots, {normalised} paragraphs run-normalised, "
+          f"{stats.cell_visits} table cells visited once each "
+          f"({stats.saved_visits} repeat visits of merged cells saved)")
+    return CompiledTemplate(template_file, output.getvalue(), text_slots, signature_slots)
+
+
+def _cache_paths(cache_dir, digest):
+    return os.path.join(cache_dir, f'{digest}.json'), os.path.join(cache_dir, f'{digest}.docx')
+
+
+def _write_atomic(path, data):
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def load_cached_template(template_file, digest, cache_dir):
+    """Load compiled artefacts for the template with this SHA-256, or None if there are none."""
+    index_path, docx_path = _cache_paths(cache_dir, digest)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != CACHE_FORMAT_VERSION:
+            return None
+        with open(docx_path, 'rb') as f:
+            template_bytes = f.read()
+    except (OSError, ValueError):
+        return None
+    text_slots = [tuple(slot) for slot in index['text_slots']]
+    signature_slots = [tuple(slot) for slot in index['signature_slots']]
+    print(f"Loaded compiled template '{template_file}' from cache ({digest[:12]})")
+    return CompiledTemplate(template_file, template_bytes, text_slots, signature_slots)
+
+
+def store_cached_template(compiled, digest, cache_dir):
+    """Persist compiled artefacts and drop artefacts of earlier versions of the same template."""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        index_path, docx_path = _cache_paths(cache_dir, digest)
+        template_path = os.path.abspath(compiled.template_file)
+        for name in os.listdir(cache_dir):
+            if not name.endswith('.json') or name == os.path.basename(index_path):
+                continue
+            stale_index = os.path.join(cache_dir, name)
+            try:
+                with open(stale_index, 'r', encoding='utf-8') as f:
+                    if json.load(f).get('template_file') != template_path:
+                        continue
+                os.remove(stale_index)
+                os.remove(stale_index[:-len('.json')] + '.docx')
+            except (OSError, ValueError):
+                continue
+
+        # The .docx goes first so a readable index always has its template next to it
+        _write_atomic(docx_path, compiled.template_bytes)
+        index = {
+            'version': CACHE_FORMAT_VERSION,
+            'template_file': template_path,
+            'text_slots': compiled.text_slots,
+            'signature_slots': compiled.signature_slots,
+        }
+        _write_atomic(index_path, json.dumps(index).encode('utf-8'))
+    except OSError as e:
+        print(f"Could not write template cache: {e}")
+
+
+def get_compiled_template(template_file, cache_dir=None):
+    """Return the compiled index for template_file, recompiling only when the file changes.
+
+    Within a process the index is keyed by path, mtime and size.  Across processes the
+    artefacts are keyed by the SHA-256 of the template bytes in cache_dir (default
+    TEMPLATE_CACHE_DIR), so a new worker only loads a small index and the normalised
+    template instead of compiling.
+    """
+    stat = os.stat(template_file)
+    cache_key = (os.path.abspath(template_file), stat.st_mtime_ns, stat.st_size)
+    compiled = _compiled_templates.get(cache_key)
+    if compiled is None:
+        with _compile_lock:
+            compiled = _compiled_templates.get(cache_key)
+            if compiled is None:
+                cache_dir = cache_dir or TEMPLATE_CACHE_DIR
+                with open(template_file, 'rb') as f:
+                    template_bytes = f.read()
+                digest = hashlib.sha256(template_bytes).hexdigest()
+                compiled = load_cached_template(template_file, digest, cache_dir)
+                if compiled is None:
+                    compiled = compile_template(template_file, template_bytes)
+                    store_cached_template(compiled, digest, cache_dir)
+                _compiled_templates[cache_key] = compiled
+    return compiled
+
+
+def fill_segments(segments, values, blank_keys=()):
+    """Join compiled segments, substituting values for placeholder keys (keys in blank_keys are dropped)."""
+    parts = []
+    for i, segment in enumerate(segments):
+        if i % 2 == 0:
+            parts.append(segment)
+        elif segment in blank_keys:
+            continue
+        else:
+            parts.append(values.get(segment, segment))
+    return ''.join(parts)
+
+
+def report_missing_values(compiled, values):
+    missing = compiled.missing_values(values)
+    if missing:
+        print(f"Template placeholders without a value (left in the document): {', '.join(missing)}")
+    return missing
+
+
+def write_slots(compiled, paragraphs, values, parent=None):
+    """Fill every compiled slot in one pass over the slots.
+
+    paragraphs is template_paragraphs() of a fresh copy of the normalised template.
+    Placeholder runs keep their formatting; only their text changes.  Returns
+    (Run, signature key) pairs for the runs that should receive a signature image.
+    """
+    for index, run_index, segments in compiled.text_slots:
+        updated_text = fill_segments(segments, values)
+        if updated_text == ''.join(segments):
+            continue
+        if run_index is None:
+            Paragraph(paragraphs[index], parent).text = updated_text
+        else:
+            Run(paragraphs[index].findall(W_R)[run_index], parent).text = updated_text
+
+    signature_runs = []
+    for index, run_index, segments, signature_key in compiled.signature_slots:
+        updated_text = fill_segments(segments, values, SIGNATURE_PLACEHOLDERS).strip()
+        para = Paragraph(paragraphs[index], parent)
+        if run_index is None:
+            para.text = updated_text
+            run = para.add_run()
+        else:
+            run = Run(paragraphs[index].findall(W_R)[run_index], para)
+            run.text = updated_text
+        signature_runs.append((run, signature_key))
+    return signature_runs
+
+
+def render_into(compiled, doc, placeholder_values, signature_images):
+    """Write placeholder values and signature images straight into the compiled slots of doc.
+
+    doc must be a freshly opened copy of compiled.template_bytes.  signature_images maps
+    'p230' / 'p234' to an image path or file-like object.
+    """
+    values = {key: convert_to_str(value) for key, value in placeholder_values.items()}
+    report_missing_values(compiled, values)
+    signature_runs = write_slots(compiled, template_paragraphs(doc.element), values, doc)
+
+    inserted = 0
+    for run, signature_key in signature_runs:
+        image = signature_images.get(signature_key)
+        if image is None:
+            continue
+        try:
+            run.add_picture(image, width=Inches(2))
+            inserted += 1
+        except Exception as img_e:
+            print(f"An error occurred with image processing: {img_e}")
+
+    return inserted
+
+
+def render_document(template_file, placeholder_values, signature_images):
+    """Render template_file from its cached bytes and return the filled .docx as a BytesIO."""
+    compiled = get_compiled_template(template_file)
+    doc = Document(io.BytesIO(compiled.template_bytes))
+    if not render_into(compiled, doc, placeholder_values, signature_images):
+        print("No signature placeholder found.")
+    output = io.BytesIO()
+    doc.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,109 @@
+# Evidence bundling for the ESFA form emails.
+#
+# Most evidence comes in as a front and an optional "Back Side of The Document"
+# photo per document type, so a full submission carried 20+ loose files.  The
+# image uploads of one document type (the checkbox label they were uploaded
+# under) are now merged into a single multi-page PDF, one page per image.  JPEG
+# pages are embedded as they are (DCT passthrough), so the PDF is barely larger
+# than the already recompressed images.  PDF and DOCX uploads are attached as
+# they are.  The PDFs are built in the attachment process pool.
+
+import io
+import re
+
+from PIL import Image as PILImage
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from attachments import IMAGE_FORMATS, map_in_process_pool
+
+# ASCII85 would add a quarter to every embedded image; the PDFs are binary attachments anyway
+rl_config.useA85 = 0
+
+# Page margin in points (1/72 inch)
+PAGE_MARGIN = 24
+
+
+def _image_format(data):
+    try:
+        with PILImage.open(io.BytesIO(data)) as image:
+            return image.format
+    except (OSError, ValueError, PILImage.DecompressionBombError):
+        return None
+
+
+def images_to_pdf(images):
+    """Return the bytes of a compressed PDF with one A4 page per image, given as bytes.
+
+    Landscape images get a landscape page; each image is fitted within the margins
+    and centred.
+    """
+    output = io.BytesIO()
+    pdf = canvas.Canvas(output, pagesize=A4, pageCompression=1)
+    for data in images:
+        image = ImageReader(io.BytesIO(data))
+        width, height = image.getSize()
+        page_width, page_height = landscape(A4) if width > height else A4
+        pdf.setPageSize((page_width, page_height))
+        scale = min((page_width - 2 * PAGE_MARGIN) / width, (page_height - 2 * PAGE_MARGIN) / height)
+        draw_width, draw_height = width * scale, height * scale
+        pdf.drawImage(image, (page_width - draw_width) / 2, (page_height - draw_height) / 2,
+                      draw_width, draw_height, mask='auto')
+        pdf.showPage()
+    pdf.save()
+    return output.getvalue()
+
+
+def bundle_name(document_type):
+    """File name of the PDF bundle for document_type."""
+    name = re.sub(r'[^\w\- ]+', '', document_type).strip()
+    name = re.sub(r'\s+', ' ', name)
+    return f'{name or "Evidence"}.pdf'
+
+
+def bundle_evidence(files):
+    """Merge the images among files, given as (file name, bytes, document type) triples, into one PDF per type.
+
+    A bundle takes the place of its first image; files without a document type and
+    anything that is not a JPEG or PNG image stay separate.  Returns the
+    attachments as (file name, bytes) pairs and {bundle name: [image file names]}.
+    """
+    groups = {}
+    slots = []
+    for name, data, document_type in files:
+        if document_type and _image_format(data) in IMAGE_FORMATS:
+            if document_type not in groups:
+                groups[document_type] = []
+                slots.append(document_type)
+            groups[document_type].append((name, data))
+        else:
+            slots.append((name, data))
+
+    document_types = [slot for slot in slots if isinstance(slot, str)]
+    try:
+        pdfs = dict(zip(document_types, map_in_process_pool(
+            images_to_pdf, [[data for _, data in groups[document_type]] for document_type in document_types])))
+    except Exception as e:
+        # An image reportlab cannot read: send the uploads unbundled rather than not at all
+        print(f"Unable to bundle the evidence into PDFs, attaching the images separately: {e}")
+        return [(name, data) for name, data, _ in files], {}
+
+    bundled = []
+    bundles = {}
+    # A bundle must not take the name of an attachment that is sent as is
+    taken = {slot[0] for slot in slots if not isinstance(slot, str)}
+    for slot in slots:
+        if not isinstance(slot, str):
+            bundled.append(slot)
+            continue
+        name = bundle_name(slot)
+        root, counter = name[:-len('.pdf')], 2
+        while name in taken:
+            name = f'{root} ({counter}).pdf'
+            counter += 1
+        taken.add(name)
+        bundled.append((name, pdfs[slot]))
+        bundles[name] = [image_name for image_name, _ in groups[slot]]
+    return bundled, bundles
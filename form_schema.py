@@ -0,0 +1,956 @@
+# Declarative steps of the ESFA form.
+#
+# Every question of steps 1-10 (and the training provider's name and position
+# of step 11) is declared here as data, in page order: the FormState field that
+# keeps the answer, the label and options, an option -> {placeholder: code}
+# table, the value the placeholders are cleared to, when the question is shown
+# and whether the step stops until it is answered.  Headings and notes between
+# the questions, the uploaders of the evidence documents and the LLDD grid are
+# declared the same way, so a step is a list of items and app.py only adds the
+# navigation.
+#
+# The declarations are compiled once at import into setters resolved through
+# form_state.PLACEHOLDER_FIELDS, the same table the document is rendered from,
+# so a code can only be written to a placeholder the template actually
+# receives.  A rerun calls render_step(step, form, uploads), which clears the
+# placeholders of each item, shows the visible ones and applies the
+# precompiled codes.
+#
+# A placeholder target is a placeholder id ('p110') or a FormState path
+# ('right_to_work.resident'); visible_if=(path, value) shows an item while the
+# answer at path is value, one of value when it is a tuple, or includes it
+# when the answer is a list (multiselect).  A hidden question's answer is
+# cleared to None, so the questions that depend on it are hidden too.
+
+from datetime import date, datetime, timedelta
+from operator import attrgetter
+
+import streamlit as st
+
+from config import get_config
+from form_state import LLDD_RANKS, LLDD_TYPES, PLACEHOLDER_FIELDS
+
+UPLOAD_TYPES = ['docx', 'pdf', 'jpg', 'jpeg', 'png']
+# Evidence of residence and the latest payslip must be this recent
+RECENT_EVIDENCE_DAYS = 90
+DATE_FORMAT = "%d-%m-%Y"
+
+
+class Field:
+    """A question: its answer is kept at answer and options maps option -> {placeholder: code}."""
+
+    widget = None
+    # Whether the widget is called with the options (a checkbox is not)
+    takes_options = True
+
+    def __init__(self, answer, label, options=None, blank='', visible_if=None, required=None, derive=None,
+                 **widget_args):
+        self.answer = answer
+        self.label = label
+        self.options = options
+        self.blank = blank
+        self.visible_if = visible_if
+        # Warning shown, and the step stopped, while the question is unanswered
+        self.required = required
+        # derive(form, answer) stores the values worked out from the answer
+        self.derive = derive
+        self.widget_args = widget_args
+
+
+class Choice(Field):
+    """A radio; options is a list, a {option: codes} table or a function of the form."""
+
+    widget = 'radio'
+
+
+class Select(Choice):
+    """A selectbox."""
+
+    widget = 'selectbox'
+
+
+class Multi(Choice):
+    """A multiselect: the codes of every selected option are set."""
+
+    widget = 'multiselect'
+
+
+class Check(Field):
+    """A checkbox setting marks when ticked and unmarked otherwise."""
+
+    widget = 'checkbox'
+    takes_options = False
+
+    def __init__(self, answer, label, marks=None, unmarked=None, blank='', visible_if=None, **widget_args):
+        super().__init__(answer, label, {True: marks or {}, False: unmarked or {}}, blank, visible_if,
+                         **widget_args)
+
+
+class Text(Field):
+    """A free-text answer written to one placeholder target."""
+
+    widget = 'text_input'
+
+    def __init__(self, answer, label, blank='', visible_if=None, required=None, derive=None, **widget_args):
+        super().__init__(answer, label, None, blank, visible_if, required, derive, **widget_args)
+
+
+class TextArea(Text):
+    widget = 'text_area'
+
+
+class Number(Text):
+    widget = 'number_input'
+
+
+class Date(Text):
+    """A date, stored as DD-MM-YYYY; recent=True stops the step for evidence older than RECENT_EVIDENCE_DAYS."""
+
+    widget = 'date_input'
+
+    def __init__(self, answer, label, blank='', visible_if=None, required=None, derive=None, recent=False,
+                 **widget_args):
+        super().__init__(answer, label, blank, visible_if, required, derive, format='DD/MM/YYYY', **widget_args)
+        self.recent = recent
+
+
+class Note:
+    """Text between the questions: getattr(st, widget)(*args); an argument may be a function of the form."""
+
+    def __init__(self, *args, widget='write', visible_if=None, **widget_args):
+        self.args = args
+        self.widget = widget
+        self.visible_if = visible_if
+        self.widget_args = widget_args
+
+
+class Upload:
+    """The uploader of the document chosen by the answer at on: documents maps answer -> document type.
+
+    prompt is shown above the uploader, formatted with the document type, or
+    taken from a {answer: prompt} table; back_side labels an optional second
+    uploader for the back of the document.  The files of a hidden uploader are
+    dropped from the upload registry.
+    """
+
+    def __init__(self, key, on, documents, prompt=None, label='Upload {}', back_side=None):
+        self.key = key
+        self.on = on
+        self.documents = documents
+        self.prompt = prompt
+        self.label = label
+        self.back_side = back_side
+
+
+class Columns:
+    """Groups of items shown side by side."""
+
+    def __init__(self, *groups, count=None):
+        self.groups = groups
+        self.count = count or len(groups)
+
+
+# ---------------------------------------------------------------------------
+# Options
+# ---------------------------------------------------------------------------
+
+ETHNICITY_OPTIONS = {
+    'White': {
+        'English/ Welsh/ Scottish/ N Irish/ British': '31',
+        'Irish': '32',
+        'Roma, Gypsy or Irish Traveller': '33',
+        'Any other white background': '34'
+    },
+    'Mixed/ Multiple ethnic group': {
+        'White and Black Caribbean': '35',
+        'White and Black African': '36',
+        'White and Asian': '37',
+        'Any other mixed/ multiple ethnic background': '38'
+    },
+    'Asian/ Asian British': {
+        'Bangladeshi': '41',
+        'Chinese': '42',
+        'Indian': '39',
+        'Pakistani': '40',
+        'Any other Asian background': '43'
+    },
+    'Black/ African/ Caribbean/ Black British': {
+        'African': '44',
+        'Caribbean': '45',
+        'Any Other Black/ African/ Caribbean background': '46'
+    },
+    'Other Ethnic Group': {
+        'Arab': '47',
+        'Any other ethnic group': '48'
+    }
+}
+
+LLDD_LABELS = dict(zip(LLDD_TYPES, (
+    'Vision impairment (4)',
+    'Hearing impairment (5)',
+    'Disability affecting mobility (6)',
+    'Profound complex disabilities (7)',
+    'Social and emotional difficulties (8)',
+    'Mental health difficulty (9)',
+    'Moderate learning difficulty (10)',
+    'Severe learning difficulty (11)',
+    'Dyslexia (12)',
+    'Dyscalculia (13)',
+    'Autism spectrum disorder (14)',
+    'Asperger\'s syndrome (15)',
+    'Temporary disability after illness (for example post-viral) or accident (16)',
+    'Speech, Language and Communication Needs (17)',
+    'Other physical disability (18)',
+    'Other specific learning difficulty (e.g. Dyspraxia) (19)',
+    'Other medical condition (for example epilepsy, asthma, diabetes) (20)',
+    'Other learning difficulty (90)',
+    'Other disability (97)',
+)))
+
+UNEMPLOYED = "Unemployed (looking for work and available to start work) -> go to section A"
+ECONOMICALLY_INACTIVE = ("Economically Inactive (not looking for work and not available to start work) -> "
+                         "Go to section B")
+EMPLOYED = "Employed (including self-employed) -> go to section C"
+
+UNEMPLOYMENT_EVIDENCE = {
+    "A Letter or Document from JCP or DWP": 'Document from JCP or DWP',
+    "A written referral from a careers service": 'written referral from a careers service',
+    "Third Party Verification or Referral form": 'Third Party Verification or Referral form',
+}
+OTHER_UNEMPLOYMENT_EVIDENCE = "Other (please specify)"
+
+NATIONALITY_DOCUMENTS = {
+    'Full UK Passport': 'Full UK Passport',
+    'Full EU Member Passport (must be in date - usually 10 years)': 'Full EU Member Passport',
+    'National Identity Card (EU)': 'National Identity Card (EU)',
+}
+EEA_DOCUMENTS = tuple(NATIONALITY_DOCUMENTS)[1:]
+SETTLED_STATUSES = (
+    'a. Hold settled status granted under the EU Settlement Scheme (EUSS)',
+    'b. Hold pre-settled status granted under the European Union Settlement Scheme (EUSS)',
+    'c. Hold leave to remain with permission to work granted under the new Points Based Immigration System'
+)
+IMMIGRATION_DOCUMENTS = (
+    "a. Letter from the UK Immigration and Nationality Directorate granting indefinite leave to remain "
+    "(settled status)",
+    "b. Passport either endorsed 'indefinite leave to remain' – (settled status) or includes work or residency "
+    "permits or visa stamps (unexpired) and all related conditions met; add details below",
+    "c. Some non-EEA nationals have an Identity Card (Biometric Permit) issued by the Home Office in place of a "
+    "visa, confirming the participant’s right to stay, work or study in the UK – these cards are acceptable"
+)
+
+EMPLOYMENT_EVIDENCE = (
+    'a. Latest Payslip (maximum 3 months prior to start date)',
+    'b. Employment Contract',
+    'c. Confirmation from the employer that the Participant is currently employed by them which must detail: '
+    'Participant full name, contracted hours, start date AND date of birth or NINO',
+    'd. Redundancy consultation or notice (general notice to group of staff or individual notifications) At '
+    'risk of Redundancy only',
+    'e. Self-employed',
+    'f. Other evidence as listed in the \'Start-Eligibility Evidence list\' under Employed section - State below',
+    'g. Unemployed (complete the Employment section in ILP form)'
+)
+SELF_EMPLOYED_EVIDENCE = (
+    "HMRC 'SA302' self-assessment tax declaration, with acknowledgement of receipt (within last 12 months)",
+    'Records to show actual payment of Class 2 National Insurance Contributions (within last 12 months)',
+    'Business records in the name of the business - evidence that a business has been established and is '
+    'active / operating (within last 12 months)',
+    'If registered as a Limited company: Companies House records / listed as Company Director (within last 12 '
+    'months)'
+)
+
+EDUCATION_LEVELS = (
+    'ISCED 0 - Lacking Foundation skills (below Primary Education)',
+    'ISCED 1 - Primary Education',
+    'ISCED 2 - GCSE D-G or 3-1/BTEC Level 1/Functional Skills Level 1',
+    'ISCED 3 - GCSE A-C or 9-4/AS or A Level/NVQ or BTEC Level 2 or 3',
+    'ISCED 4 - N/A',
+    'ISCED 5 to 8 - BTEC Level 5 or NVQ Level 4, Foundation Degree, BA, MA or equivalent'
+)
+
+PRIVACY_NOTICE = """
+    Privacy Notice
+
+    This privacy notice is issued by the Education and Skills Funding Agency (ESFA) on behalf of the Secretary of State for the Department of Education (DfE) to inform learners about the Individualised Learner Record (ILR) and how their personal information is used in the ILR. Your personal information is used by the DfE to exercise our functions under article 6(1)(e) of the UK GDPR and to meet our statutory responsibilities, including under the Apprenticeships, Skills, Children and Learning Act 2009.
+
+    The ILR collects data about learners and learning undertaken. Publicly funded colleges, training organisations, local authorities, and employers (FE providers) must collect and return the data to the ESFA each year under the terms of a funding agreement, contract or grant agreement. It helps ensure that public money distributed through the ESFA is being spent in line with government targets. It is also used for education, training, employment, and wellbeing purposes, including research. We retain ILR learner data for 3 years for operational purposes and 66 years for research purposes. For more information about the ILR and the data collected, please see the ILR specification at https://www.gov.uk/government/collections/individualised-learner-record-ilr
+
+    ILR data is shared with third parties where it complies with DfE data sharing procedures and where the law allows it. The DfE and the English European Social Fund (ESF) Managing Authority (or agents acting on their behalf) may contact learners to carry out research and evaluation to inform the effectiveness of training. In these cases, it is part of our statutory duties and we do not need your consent.
+
+    For more information about how your personal data is used and your individual rights, please see the DfE Roles and Responsibilities Personal Information Charter(https://www.gov.uk/government/organisations/department-for-education/about/personal-information-charter) and the ESFA Privacy Notice (https://www.gov.uk/government/publications/esfa-privacy-notice).
+
+    If you would like to get in touch with us, you can contact the DfE in the following ways:
+    - Using our online contact form at https://www.gov.uk/government/organisations/department-for-education/about/personal-information-charter.
+    - By telephoning the DfE Helpline on 0370 000 2288 or in writing to - Data Protection Officer, Ministerial and Public Communications Division, Department for Education, Piccadilly Gate, Store Street, Manchester, M1 2WD.
+
+    By completing the 'Learner Declaration'. This means that:
+
+    - You understand this provision is delivered by Prevista Ltd or by the named subcontractor on page 1 on behalf Prevista Ltd (or sub-contractor where indicated).
+    - You will be the provider know of any changes in your personal circumstances.
+    - You fully agree that the provider can process information about you.
+    - You understand that the form will be kept until 31st December 2030 at the latest.
+
+    Prevista Ltd will:
+
+    - Provide appropriate guidance and support to the Subcontractor to ensure that they deliver high-quality services.
+    - Monitor and evaluate the performance of the Subcontractor regularly to ensure that they meet the agreed-upon standards.
+    - Provide the necessary resources and information to the Subcontractor to enable them to carry out their work effectively.
+    - Ensure that the Subcontractor complies with all relevant laws and regulations.
+
+    The Subcontractor will:
+
+    - Deliver the agreed-upon services to a high standard and in a timely manner.
+    - Comply with all relevant laws and regulations, including health and safety requirements.
+    - Provide regular progress reports and updates to Prevista to ensure that they are kept informed of the work being carried out.
+    - Work collaboratively with Prevista to ensure that the needs of students and other stakeholders are met.
+    """
+
+# Date pickers of the form: any date from 1900 to the end of the programme
+_PICKER = dict(min_value=date(1900, 1, 1), max_value=date(2025, 12, 31), help="Choose a date")
+
+
+# ---------------------------------------------------------------------------
+# Values worked out from an answer
+# ---------------------------------------------------------------------------
+
+def _support_options(form):
+    # The partners of the routing table (partners.json), in its order
+    return ["    ", *get_config().partner_names]
+
+
+def _ethnicities(form):
+    return list(ETHNICITY_OPTIONS[form.contact.ethnicity_category])
+
+
+def _ethnicity_code(form, ethnicity):
+    form.contact.ethnicity_code = int(ETHNICITY_OPTIONS[form.contact.ethnicity_category][ethnicity])
+    form.contact.ethnicity_vars = {f'ethnicity_{i}': '' for i in range(31, 49)}
+    form.contact.ethnicity_vars[f'ethnicity_{form.contact.ethnicity_code}'] = 'X'
+
+
+def _current_age(form, born):
+    today = date.today()
+    form.personal.current_age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+    form.personal.current_age_text = 'Current Age at Start of Programme: ' + str(form.personal.current_age)
+
+
+def _clean_email(form, email):
+    form.contact.email_address = email.strip().replace(" ", "_").lower()
+
+
+# ---------------------------------------------------------------------------
+# Generated items
+# ---------------------------------------------------------------------------
+
+# (label, placeholder target) of the E02/E03 evidence checkboxes, for the summary of step 11
+_EVIDENCE_CHECKS = []
+
+
+def _evidence(target, label, key_prefix):
+    """A proof of age or address checkbox with the uploaders of its document."""
+    path = _path(target)
+    _EVIDENCE_CHECKS.append((label, attrgetter(path)))
+    return (
+        Check(None, label, {target: 'X'}, {target: '-'}, key=f"{key_prefix}_checkbox"),
+        Upload(f"{key_prefix}_uploader", path, {'X': label}, prompt='Please upload a copy of your {}',
+               back_side="Optional - Upload Back Side of The Document"),
+    )
+
+
+def _lldd_grid():
+    """The Primary/Secondary/Tertiary checkboxes of every LLDD or health problem type."""
+    shown = ('lldd.disability', 'Y')
+    items = []
+    for lldd_type in LLDD_TYPES:
+        items.append(Note(f'**{LLDD_LABELS[lldd_type]}**', visible_if=shown))
+        for rank in LLDD_RANKS:
+            items.append(Check(None, rank.title(), {f'lldd.{lldd_type}_{rank}': 'X'}, visible_if=shown,
+                               key=f'{lldd_type}_{rank}_checkbox'))
+    items.append(Note('**Prefer not to say (98)**', visible_if=shown))
+    items.append(Check(None, 'Primary', {'p176': 'X'}, visible_if=shown, key='prefer_not_to_say_checkbox'))
+    return items
+
+
+def _employer_detail(target, label):
+    return Text(target, label, visible_if=('employment.employment_status', EMPLOYED))
+
+
+# ---------------------------------------------------------------------------
+# Steps
+# ---------------------------------------------------------------------------
+
+def _steps():
+    unemployed = ('employment.employment_status', UNEMPLOYED)
+    inactive = ('employment.employment_status', ECONOMICALLY_INACTIVE)
+    employed = ('employment.employment_status', EMPLOYED)
+    claiming = ('benefits.claiming_benefits', 'Y')
+    eea_national = ('right_to_work.british_or_not', 'Yes')
+    non_eea_national = ('right_to_work.british_or_not', 'No')
+    eea_document = ('right_to_work.selected_option_nationality', EEA_DOCUMENTS)
+    payslip = ('employment_evidence.selected_main_option', EMPLOYMENT_EVIDENCE[0])
+    training = ('training.qualification_or_training', 'Yes')
+    in_job = ('skills.current_job', 'Yes')
+
+    return {
+        1: [
+            Note('header/header.jpg', widget='image', use_column_width=True),
+            Note('Welcome', widget='title'),
+            Select('support.selected_option', "Who is supporting you to fill this form?", _support_options),
+            Note('Please fill out the the complete form', widget='subheader'),
+            Note('Please click Next to begin.', widget='text'),
+        ],
+        2: [
+            Note("> 1: Personal Information", widget='title'),
+            Choice('personal.title', "Title", {
+                'Mr': {'p110': 'X'}, 'Mrs': {'p111': 'X'}, 'Miss': {'p112': 'X'}, 'Ms': {'p113': 'X'},
+            }),
+            Text('p1', 'First Name'),
+            Text('p2', 'Middle Name (optional)'),
+            Text('p3', 'Family Name'),
+            Date('p243', "Aim Start Date", **_PICKER),
+            Date('p244', "Expected Aim End Date", **_PICKER),
+            Select('personal.qualification', 'Qualification', [
+                'High School Diploma', 'Bachelor\'s Degree', 'Master\'s Degree', 'PhD', 'Other'
+            ]),
+            Choice('personal.gender', "Gender", {
+                'M': {'p114': 'M'}, 'F': {'p115': 'F'}, 'Other': {'p116': 'Other'},
+            }),
+            Text('p117', "If Other, please state", visible_if=('personal.gender', 'Other')),
+            Date('p4', "Date of Birth", derive=_current_age, value=datetime(2000, 1, 1), **_PICKER),
+            Note(lambda form: form.personal.current_age_text, widget='text'),
+        ],
+        3: [
+            Note("> 2: Ethnicity", widget='title'),
+            Select('contact.ethnicity_category', 'Select Ethnicity Category', list(ETHNICITY_OPTIONS)),
+            Select('contact.ethnicity', 'Select Ethnicity', _ethnicities, derive=_ethnicity_code),
+            Note(lambda form: f'Ethnicity Code: {form.contact.ethnicity_code}'),
+            Text('p137', "National Insurance Number"),
+            Text('p138', "House No./Name & Street"),
+            Text('p139', "Suburb / Village (Optional)"),
+            Text('p140', "Town / City"),
+            Text('p141', "County (optional)"),
+            Text('p142', "Country of Domicile"),
+            Text('p143', "Current Postcode"),
+            Text('p144', "Postcode Prior to Enrolment"),
+            Text('p145', "Email Address", derive=_clean_email),
+            Text('p146', "Primary Telephone Number"),
+            Text('p147', "Secondary Telephone Number (optional)"),
+            Text('p148', "Next of kin/Emergency contact"),
+            Text('p149', "Emergency Contact Phone Number"),
+        ],
+        4: [
+            Note("> 3: Household", widget='title'),
+            Note('Household Situation', widget='header'),
+            Note('Please select the most relevant options. (Tick ALL relevant boxes)', widget='subheader'),
+            Check(None, '1 - No household member in employment with one or more dependent children',
+                  {'p150': 'X'}, key='JH, JH+DC'),
+            Check(None, '2 - No household member in employment with no dependent children', {'p151': 'X'}, key='JH'),
+            Check(None, '3 - Participant lives in a single adult household with dependent children',
+                  {'p152': 'X'}, key='SAH+DC'),
+            Check(None, '4 - Learner lives in single unemployed adult household with dependent children',
+                  {'p153': 'X'}, key='JH, SAH+DC'),
+            Check(None, '99 - None of the above apply', {'p154': 'X'}, key='N/A'),
+        ],
+        5: [
+            Note("> 4: LLDD, Health Problems, Other Disadvantaged Section", widget='title'),
+            Note('LLDD, Health Problems, Other Disadvantaged', widget='header'),
+            Note('Do you consider yourself to have a long term disability, health problem or any learning '
+                 'difficulties? Choose the correct option. If Yes enter code in Primary LLDD or HP; you can add '
+                 'multiple LLDD or HP but primary must be recorded if Yes selected.'),
+            Choice('lldd.disability', 'Choose the correct option:', {
+                'N': {'p156': 'N'}, 'Y': {'p155': 'Y'},
+            }, index=0),
+            Note('LLDD or Health Problem Type', widget='subheader', visible_if=('lldd.disability', 'Y')),
+            *_lldd_grid(),
+            TextArea('p177', 'Is there any other additional information that may impact on your ability to learn?',
+                     visible_if=('lldd.disability', 'Y')),
+            Note('Other disadvantaged', widget='subheader'),
+            Choice('lldd.ex_offender', 'Ex Offender?', {
+                'N': {'p179': 'N'}, 'Y': {'p178': 'Y'}, 'Choose not to say': {'p180': 'Choose not to say'},
+            }),
+            Choice('lldd.homeless', 'Homeless?', {
+                'N': {'p190': 'N'}, 'Y': {'p189': 'Y'}, 'Choose not to say ': {'p191': 'Choose not to say'},
+            }),
+        ],
+        6: [
+            Note("> 5: Referral Source Section", widget='title'),
+            Note('Referral Source', widget='header'),
+            Columns(
+                [Check('referral.internally_sourced', 'Internally sourced', {'p181': 'X'}),
+                 Check('referral.recommendation', 'Recommendation', {'p182': 'X'}),
+                 Check('referral.promotional_material', 'Promotional material', {'p188': 'X'})],
+                [Check('referral.self_referral', 'Self Referral', {'p184': 'X'}),
+                 Check('referral.family_friends', 'Family/ Friends', {'p185': 'X'}),
+                 Check('referral.event', 'Event (please specify)')],
+                [Check('referral.website', 'Website', {'p187': 'X'}),
+                 Check('referral.jobcentre_plus', 'JobCentre Plus', {'p188a': 'X'}),
+                 Check('referral.other', 'Other (please specify)')],
+                count=4),
+            # The event and the other source are written in place of a mark
+            Text('p183', 'Please specify the event', visible_if=('referral.event', True)),
+            Text('p186', 'Please specify other source', visible_if=('referral.other', True)),
+            Text('p305', "Please let us know the organization or advisor who referred you to our program, or "
+                         "indicate where you found out about this opportunity. If it was through a job center, "
+                         "please specify its location."),
+        ],
+        7: [
+            Note("> 6: Employment and Monitoring Information Section", widget='title'),
+            Note('Employment and Monitoring Information', widget='header'),
+            Note('Participant Employment Status', widget='subheader'),
+            Choice('employment.employment_status', "Select your employment status:", {
+                UNEMPLOYED: {'p192': 'X'}, ECONOMICALLY_INACTIVE: {'p193': 'X'}, EMPLOYED: {'p194': 'X'},
+            }),
+
+            # Section A - Unemployment details
+            Note('Section A - Unemployment details', widget='subheader', visible_if=unemployed),
+            Note("Where a participant’s employment status is long-term unemployed proof of both unemployment and "
+                 "the length of unemployment must be obtained.", widget='text', visible_if=unemployed),
+            Choice('employment.unemployment_duration', "If you are not working, how long have you been without work?", {
+                "Up to 12 months": {'p195': 'X'}, "12 months or longer": {'p196': 'X'},
+            }, blank='-', visible_if=unemployed),
+            Note("Evidence of unemployment status (for more information look Start-Eligibility Evidence list tab)",
+                 visible_if=unemployed),
+            Select('employment.unemployment_evidence', "Select evidence type:", {
+                "A Letter or Document from JCP or DWP": {'p197': 'X'},
+                "A written referral from a careers service": {'p198': 'X'},
+                "Third Party Verification or Referral form": {'p199': 'X'},
+                OTHER_UNEMPLOYMENT_EVIDENCE: {},
+            }, blank='-', visible_if=unemployed),
+            Upload('unemployment_evidence_uploader', 'employment.unemployment_evidence', UNEMPLOYMENT_EVIDENCE),
+            Text('p200', "Please specify other evidence", blank='-',
+                 visible_if=('employment.unemployment_evidence', OTHER_UNEMPLOYMENT_EVIDENCE)),
+
+            # Section B - Economically Inactive details
+            Note('Section B - Economically Inactive details', widget='subheader', visible_if=inactive),
+            # Only the economically inactive see the question, and the form records them as Y either way
+            Choice('employment.inactive_status',
+                   "The Participant is not employed and does not claim benefits at the time of the enrolment.", {
+                       'Y': {'p201': 'Y'}, 'N': {'p201': 'Y'},
+                   }, blank='N', visible_if=inactive),
+            Text('p202', "Type of evidence for Economically Inactive Status including self-declaration statement.",
+                 blank='-', visible_if=inactive),
+            Date('p203', "Date of issue of evidence", blank='-', visible_if=inactive),
+
+            # Section C - Employment details
+            Note('Section C - Employment details', widget='subheader', visible_if=employed),
+            _employer_detail('p204', "Employer Name"),
+            _employer_detail('p205', "Employer Address 1"),
+            _employer_detail('p206', "Employer Address 2"),
+            _employer_detail('p207', "Employer Address 3"),
+            _employer_detail('p208', "Employer Postcode"),
+            _employer_detail('p209', "Main Employer Contact Name"),
+            _employer_detail('p210', "Contact Position"),
+            _employer_detail('p211', "Contact Email Address"),
+            _employer_detail('p212', "Contact Telephone Number"),
+            _employer_detail('p213', "Employer EDRS number"),
+            Choice('employment.living_wage',
+                   "Do you earn more than the National Living Wage of £20,319.00 pa (£10.42ph for 37.5 hrs pw)?", {
+                       'Y': {'p214': 'Y'}, 'N': {'p214': 'N'},
+                   }, visible_if=employed),
+            Choice('employment.employment_hours', "Employment Hours (place an X in the applicable box)", {
+                "0-15 hrs per week": {'p215a': 'X', 'p215b': '-'},
+                "16+ hrs per week": {'p215a': '-', 'p215b': 'X'},
+            }, visible_if=employed),
+            _employer_detail('p235', "Job Position"),
+            Date('p236', "Job Start Date", visible_if=employed, value=datetime(2000, 1, 1), **_PICKER),
+
+            Note("Benefits Detail", widget='header'),
+            Choice('benefits.claiming_benefits',
+                   "Are you claiming any benefits? If so, please describe below what they are.", {
+                       'N': {'p216': 'N'}, 'Y': {'p216': 'Y'},
+                   }),
+            Choice('benefits.sole_claimant', "Are you the sole claimant of the benefit?", {
+                'Y': {'p217': 'Y'}, 'N': {'p217': 'N'},
+            }, visible_if=claiming),
+            Multi('benefits.benefits_list', "Select the benefits you are claiming:", {
+                "Universal Credit (UC)": {'p218': 'X'},
+                "Job Seekers Allowance (JSA)": {'p219': 'X'},
+                "Employment and Support Allowance (ESA)": {'p220': 'X'},
+                "Incapacity Benefit (or any other sickness related benefit)": {'p221': 'X'},
+                "Personal Independence Payment (PIP)": {'p222': 'X'},
+                "Other - please state": {},
+            }, visible_if=claiming),
+            Text('p223', "Please state other benefit", visible_if=('benefits.benefits_list', "Other - please state")),
+            Date('p224', "From what date has the above claim been in effect?", visible_if=claiming,
+                 required="Please choose Benefit Claim Date.", value=None, min_value=date(1900, 1, 1),
+                 max_value=date.today, help="Choose a date"),
+
+            # E01
+            Note('E01: Right to Live and Work in the UK', widget='header'),
+            Choice('right_to_work.resident', 'Have you been resident in the UK/EEA for the previous 3 years?', {
+                'Yes': {'p237y': 'X', 'p237n': ''}, 'No': {'p237y': '', 'p237n': 'X'},
+            }),
+            Text('p238', 'Country of Birth:'),
+            Number('p239', 'How many years have you lived in the UK?', min_value=0),
+            Choice('right_to_work.british_or_not',
+                   'Are you a UK OR Irish National OR European Economic Area (EEA) National?', ['Yes', 'No']),
+            Text('p5', 'Nationality', blank='-', visible_if=eea_national),
+            Choice('right_to_work.selected_option_nationality', "Select the type of document:", {
+                option: {'p6': '', 'p7': '', 'p8': '', target: 'X'}
+                for option, target in zip(NATIONALITY_DOCUMENTS, ('p6', 'p7', 'p8'))
+            }, blank='-', visible_if=eea_national),
+            Upload('nationality_document_uploader', 'right_to_work.selected_option_nationality',
+                   NATIONALITY_DOCUMENTS, prompt='Please upload a copy of your {}',
+                   back_side="Optional - Upload Back Side of Document"),
+            Note('In order to be eligible for ESF funding, EEA Nationals must meet one of the following conditions',
+                 widget='text', visible_if=eea_document),
+            Choice('right_to_work.settled_status', "Select your status:", {
+                option: {'p9': '', 'p10': '', 'p11': '', target: 'X'}
+                for option, target in zip(SETTLED_STATUSES, ('p9', 'p10', 'p11'))
+            }, blank='-', visible_if=eea_document, required="Please select your status before proceeding.",
+                index=None),
+            Upload('share_code_uploader', 'right_to_work.settled_status',
+                   dict.fromkeys(SETTLED_STATUSES, 'Immigration Status Share Code'),
+                   prompt='Please upload your share code which is accessible from the following link:',
+                   label="https://www.gov.uk/check-immigration-status",
+                   back_side="Optional - Upload Back Side of Document"),
+            Text('p12', 'Nationality ', blank='-', visible_if=non_eea_national),
+            Check('right_to_work.passport_non_eu_checked',
+                  'Passport from non-EU member state (must be in date) AND any of the below a, b, or c',
+                  {'p13': 'X'}, {'p13': ''}, blank='-', visible_if=non_eea_national),
+            Upload('non_eu_passport_uploader', 'right_to_work.passport_non_eu', {'X': 'Non-EU Passport'},
+                   prompt='Please upload a copy of your non-EU Passport',
+                   back_side="Optional - Upload Back Side of Document"),
+            Choice('right_to_work.document_type', "Select the type of document:", {
+                option: {'p14': '', 'p15': '', 'p16': '', target: 'X'}
+                for option, target in zip(IMMIGRATION_DOCUMENTS, ('p14', 'p15', 'p16'))
+            }, blank='-', visible_if=non_eea_national,
+                required="Please select the type of document before proceeding.", index=None),
+            Upload('immigration_document_uploader', 'right_to_work.document_type', dict(zip(IMMIGRATION_DOCUMENTS, (
+                'Letter from UK Immigration and Nationality Directorate',
+                'Endorsed Passport',
+                'Identity Card (Biometric Permit)',
+            ))), prompt=dict(zip(IMMIGRATION_DOCUMENTS, (
+                'Please upload your Letter from the UK Immigration and Nationality Directorate',
+                'Please upload your endorsed passport',
+                'Please upload your Identity Card (Biometric Permit)',
+            ))), back_side="Optional - Upload Back Side of Document"),
+            Text('p17', 'Country of issue'),
+            Text('p18', 'ID Document Reference Number'),
+            Date('p19', "Date of Issue", value=datetime(2000, 1, 1), **_PICKER),
+            Date('p20', "Date of Expiry", value=datetime(2000, 1, 1),
+                 **dict(_PICKER, max_value=date(2050, 12, 31))),
+            Note("Additional Notes"),
+            TextArea('p21', 'Use this space for additional notes where relevant (type of Visa, restrictions, '
+                            'expiry etc.)'),
+
+            # E02
+            Note('E02: Proof of Age', widget='header'),
+            *_evidence('p22', 'Full Passport (EU Member State)', 'full_passport_eu'),
+            *_evidence('p23', 'National ID Card (EU)', 'national_id_card_eu'),
+            *_evidence('p24', 'Firearms Certificate/Shotgun Licence', 'firearms_certificate'),
+            *_evidence('p25', 'Birth/Adoption Certificate', 'birth_adoption_certificate'),
+            *_evidence('p26', 'Drivers Licence (photo card)', 'e02_drivers_license'),
+            *_evidence('p27', 'Letter from Educational Institution* (showing DOB)', 'edu_institution_letter'),
+            *_evidence('p28', 'Employment Contract/Pay Slip (showing DOB)', 'e02_employment_contract'),
+            *_evidence('p29', 'State Benefits Letter* (showing DOB)', 'state_benefits_letter'),
+            *_evidence('p30', 'Pension Statement* (showing DOB)', 'pension_statement'),
+            *_evidence('p31', 'Northern Ireland voters card', 'northern_ireland_voters_card'),
+            Text('p32', 'Other Evidence: Please state type'),
+            Date('p33', "Date of Issue of evidence", **_PICKER),
+
+            # E03
+            Note('E03: Proof of Residence (must show the address recorded on ILP) *within the last 3 months',
+                 widget='header'),
+            *_evidence('p34', 'Drivers Licence (photo card)', 'e03_drivers_license'),
+            *_evidence('p35', 'Bank Statement *', 'bank_statement'),
+            *_evidence('proof_of_address.e03_pension_statement', 'Pension Statement*', 'e03_pension_statement'),
+            *_evidence('p37', 'Mortgage Statement*', 'mortgage_statement'),
+            *_evidence('p38', 'Utility Bill* (excluding mobile phone)', 'utility_bill'),
+            *_evidence('p39', 'Council Tax annual statement or monthly bill*', 'council_tax_statement'),
+            *_evidence('p40', 'Electoral Role registration evidence*', 'electoral_role_evidence'),
+            *_evidence('p41', 'Letter/confirmation from homeowner (family/lodging)', 'homeowner_letter'),
+            Text('p43', 'Other Evidence: Please state type '),
+            Date('p42', "Date of Issue evidence", recent=True, **_PICKER),
+
+            # E04
+            Note('E04: Employment Status (please select one option from below and take a copy)', widget='header'),
+            Choice('employment_evidence.selected_main_option', "Select an employment status or document:", {
+                option: {target: 'X'} if target else {}
+                for option, target in zip(EMPLOYMENT_EVIDENCE, ('p44', 'p45', 'p46', 'p47', None, 'p52', 'p53'))
+            }, blank='-'),
+            Upload('employment_evidence_uploader', 'employment_evidence.selected_main_option', {
+                EMPLOYMENT_EVIDENCE[0]: 'Latest Payslip (maximum 3 months prior to start date)',
+                EMPLOYMENT_EVIDENCE[1]: 'Employment Contract',
+                EMPLOYMENT_EVIDENCE[2]: 'Confirmation from the employer',
+                EMPLOYMENT_EVIDENCE[3]: 'Redundancy consultation or notice',
+                EMPLOYMENT_EVIDENCE[5]: "Other evidence as listed in the 'Start-Eligibility Evidence list'",
+                EMPLOYMENT_EVIDENCE[6]: 'Unemployed (complete the Employment section in ILP form)',
+            }, prompt='Please upload a copy of your {}'),
+            Date('p54', "Date of Issue of evidence ", visible_if=payslip, recent=True, **_PICKER),
+            Choice('employment_evidence.selected_self_employed_option', "Select self-employed evidence:", {
+                option: {target: 'X'} for option, target in zip(SELF_EMPLOYED_EVIDENCE, ('p48', 'p49', 'p50', 'p51'))
+            }, blank='-', visible_if=('employment_evidence.selected_main_option', EMPLOYMENT_EVIDENCE[4])),
+            # The self-employed evidence replaces the file of the other options: they share the uploader
+            Upload('employment_evidence_uploader', 'employment_evidence.selected_self_employed_option', dict(zip(
+                SELF_EMPLOYED_EVIDENCE, (
+                    "HMRC 'SA302' self-assessment tax declaration",
+                    'Records of Class 2 National Insurance Contributions',
+                    'Business records',
+                    'Companies House records',
+                ))), prompt='Please upload a copy of your {}'),
+        ],
+        8: [
+            Note("> 7: Details of Qualification or Training", widget='title'),
+            Note('Details of Qualification or Training', widget='header'),
+            Choice('training.qualification_or_training', 'Are you currently undertaking a qualification or training?', {
+                'No': {'p56': 'N'}, 'Yes': {'p55': 'Y'},
+            }),
+            TextArea('training.course_details', 'Course Details', visible_if=training,
+                     value='Enter details of the course'),
+            TextArea('training.funding_details', 'Funding Details', visible_if=training,
+                     value='Enter details of how the course is funded'),
+            Note('You answered "No" to currently undertaking a qualification or training.',
+                 visible_if=('training.qualification_or_training', 'No')),
+            Note('Evidenced Qualification Levels', widget='header'),
+            Note('Participant self declaration of highest qualification level', widget='subheader'),
+            Choice('training.participant_declaration', '', {
+                'Below Level 1': {'p58': 'X'},
+                'Level 1': {'p59': 'X'},
+                'Level 2': {'p60': 'X', 'p60z': 'X'},
+                'Full Level 2': {'p60': 'X', 'p60a': 'X'},
+                'Level 3': {'p61': 'X', 'p61z': 'X'},
+                'Full Level 3': {'p61': 'X', 'p61a': 'X'},
+                'Level 4': {'p62': 'X'},
+                'Level 5': {'p63': 'X', 'p63z': 'X'},
+                'Level 6': {'p63': 'X', 'p63a': 'X'},
+                'Level 7 and above': {'p63': 'X', 'p63b': 'X'},
+                'No Qualifications': {'p64': 'X'},
+            }, blank='-'),
+        ],
+        9: [
+            Note("> 8: Current Skills, Experience, and IAG", widget='title'),
+            Note('Current Skills, Experience, and IAG', widget='header'),
+            Note('Highest Level of Education at start', widget='subheader'),
+            # The marks are one box off the levels and ISCED 5 to 8 has none, as on the form so far
+            Select('skills.selected_levels', 'Select the highest level of education at start', {
+                level: {target: 'X'} if target else {}
+                for level, target in zip(EDUCATION_LEVELS, ('p94', 'p95', 'p96', 'p97', 'p98', None))
+            }, blank='-', required="Please select a valid education level before proceeding.",
+                index=None, placeholder='Choose an option'),
+            Note('Other Information', widget='header'),
+            Choice('skills.current_job', 'Are you currently doing job?', ['No', 'Yes']),
+            Note('Current Job Role and Day to Day Activities', widget='subheader', visible_if=in_job),
+            TextArea('p99', 'What is your current job role and what are your day to day activities?',
+                     blank='No job.', visible_if=in_job),
+            Note('Career Aspirations', widget='subheader'),
+            TextArea('p100', 'What are your career aspirations? (Please provide details.)'),
+        ],
+        10: [
+            Note("> 9: Privacy Notice Text", widget='title'),
+            Note('Privacy and Data Protection Information', widget='header'),
+            Note(PRIVACY_NOTICE, widget='text'),
+            Note("Choose Y or N for any of the following if you AGREE to be contacted about courses/learning "
+                 "opportunities"),
+            # Contact preferences, written as Y or N
+            Choice('privacy.contact_surveys', "For surveys & research", {'Y': {'p225': 'Y'}, 'N': {'p225': 'N'}}),
+            Choice('privacy.contact_phone', "Phone", {'Y': {'p226': 'Y'}, 'N': {'p226': 'N'}}),
+            Choice('privacy.contact_email', "Email", {'Y': {'p227': 'Y'}, 'N': {'p227': 'N'}}),
+            Choice('privacy.contact_post', "Post", {'Y': {'p228': 'Y'}, 'N': {'p228': 'N'}}),
+        ],
+        # Between the two signatures of step 11
+        11: [
+            Note('Training Provider Declarations', widget='header'),
+            Note('Declaration', 'I certify that I have seen and verified the supporting evidence as indicated above, '
+                                'to confirm the Participant eligibility for ESF funding and this specific project.',
+                 widget='text_area'),
+            Text('p232', 'Name'),
+            Text('p233', 'Position'),
+        ],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Compilation
+# ---------------------------------------------------------------------------
+
+def _path(target):
+    """The 'section.field' path of a placeholder id or path."""
+    if '.' in target:
+        return target
+    path = PLACEHOLDER_FIELDS.get(target)
+    if not isinstance(path, str):
+        raise ValueError(f"{target} is not a placeholder stored in a form field")
+    return path
+
+
+def _setter(target):
+    section, name = _path(target).split('.')
+    get_section = attrgetter(section)
+    return lambda form, value: setattr(get_section(form), name, value)
+
+
+def _visibility(visible_if):
+    if visible_if is None:
+        return None
+    path, value = visible_if
+    get_value = attrgetter(path)
+    if isinstance(value, tuple):
+        return lambda form: get_value(form) in value
+    def visible(form):
+        answer = get_value(form)
+        return value in answer if isinstance(answer, list) else answer == value
+    return visible
+
+
+def _resolved(widget_args):
+    # A widget argument given as a function, such as max_value=date.today, is worked out at every rerun
+    if not any(callable(value) for value in widget_args.values()):
+        return lambda: widget_args
+    return lambda: {name: value() if callable(value) else value for name, value in widget_args.items()}
+
+
+class CompiledField:
+    """A field declaration turned into ready-to-call setters."""
+
+    def __init__(self, declaration):
+        self.widget = declaration.widget
+        self.label = declaration.label
+        self.widget_args = _resolved(declaration.widget_args)
+        self.blank = declaration.blank
+        self.required = declaration.required
+        self.derive = declaration.derive
+        self.recent = getattr(declaration, 'recent', False)
+        self.multiple = isinstance(declaration, Multi)
+        self.visible = _visibility(declaration.visible_if)
+        self.set_answer = _setter(declaration.answer) if declaration.answer else None
+        options = declaration.options
+        self.options_for = options if callable(options) else None
+        self.options = None
+        self.codes = {}
+        setters = {}
+        if options is None:
+            self.clear = ((self.set_answer, declaration.blank),)
+        else:
+            if isinstance(options, dict):
+                setters = {target: _setter(target) for codes in options.values() for target in codes}
+                self.codes = {option: tuple((setters[target], code) for target, code in codes.items())
+                              for option, codes in options.items()}
+            if declaration.takes_options and self.options_for is None:
+                self.options = list(options)
+            self.clear = tuple((setter, declaration.blank) for setter in setters.values())
+            if self.set_answer is not None:
+                self.clear += ((self.set_answer, None),)
+
+    def show(self, page):
+        form = page.form
+        for clear, value in self.clear:
+            clear(form, value)
+        if self.visible is not None and not self.visible(form):
+            return
+        widget = getattr(st, self.widget)
+        if self.options_for is not None:
+            answer = widget(self.label, self.options_for(form), **self.widget_args())
+        elif self.options is not None:
+            answer = widget(self.label, self.options, **self.widget_args())
+        else:
+            answer = widget(self.label, **self.widget_args())
+        if answer is None:
+            if self.required:
+                st.warning(self.required)
+                st.stop()
+            return
+        if self.recent:
+            if answer < date.today() - timedelta(days=RECENT_EVIDENCE_DAYS):
+                st.warning("The date of issue is not within the last 3 months. Please select a valid date.")
+                st.stop()
+            st.success("The date of issue is within the last 3 months.")
+        if self.set_answer is not None:
+            self.set_answer(form, answer.strftime(DATE_FORMAT) if isinstance(answer, date) else answer)
+        for option in answer if self.multiple else (answer,):
+            for set_code, code in self.codes.get(option, ()):
+                set_code(form, code)
+        if self.derive is not None:
+            self.derive(form, answer)
+
+
+class CompiledNote:
+    def __init__(self, declaration):
+        self.widget = declaration.widget
+        self.args = declaration.args
+        self.dynamic = any(callable(arg) for arg in self.args)
+        self.widget_args = declaration.widget_args
+        self.visible = _visibility(declaration.visible_if)
+
+    def show(self, page):
+        if self.visible is not None and not self.visible(page.form):
+            return
+        args = tuple(arg(page.form) if callable(arg) else arg for arg in self.args) if self.dynamic else self.args
+        getattr(st, self.widget)(*args, **self.widget_args)
+
+
+class CompiledUpload:
+    def __init__(self, declaration):
+        self.keys = (declaration.key,) + ((f"{declaration.key}_1",) if declaration.back_side else ())
+        self.get_answer = attrgetter(declaration.on)
+        self.documents = declaration.documents
+        self.prompt = declaration.prompt
+        self.label = declaration.label
+        self.back_side = declaration.back_side
+
+    def show(self, page):
+        answer = self.get_answer(page.form)
+        document = self.documents.get(answer)
+        if document is None:
+            page.hidden_uploads.update(self.keys)
+            return
+        if isinstance(self.prompt, dict):
+            st.text(self.prompt[answer])
+        elif self.prompt:
+            st.text(self.prompt.format(document))
+        labels = (self.label.format(document), self.back_side)
+        for key, label in zip(self.keys, labels):
+            uploaded_file = st.file_uploader(label, type=UPLOAD_TYPES, key=key)
+            # Keyed by the uploader: re-selecting replaces its file and clearing it (None) removes it
+            page.uploads.set(key, uploaded_file, document)
+            page.shown_uploads.add(key)
+
+
+class CompiledColumns:
+    def __init__(self, declaration):
+        self.count = declaration.count
+        self.groups = [[_compile(item) for item in group] for group in declaration.groups]
+
+    def show(self, page):
+        for column, group in zip(st.columns(self.count), self.groups):
+            with column:
+                for item in group:
+                    item.show(page)
+
+
+def _compile(item):
+    if isinstance(item, Field):
+        return CompiledField(item)
+    if isinstance(item, Note):
+        return CompiledNote(item)
+    if isinstance(item, Upload):
+        return CompiledUpload(item)
+    return CompiledColumns(item)
+
+
+class _Page:
+    """One rerun of a step: the form, the upload registry and the uploaders shown or hidden so far."""
+
+    def __init__(self, form, uploads):
+        self.form = form
+        self.uploads = uploads
+        self.shown_uploads = set()
+        self.hidden_uploads = set()
+
+
+STEPS = _steps()
+COMPILED_STEPS = {step: tuple(_compile(item) for item in items) for step, items in STEPS.items()}
+
+
+def render_step(step, form, uploads):
+    """Show the items of step, storing the answers and codes in form and the files in uploads."""
+    page = _Page(form, uploads)
+    for item in COMPILED_STEPS[step]:
+        item.show(page)
+    # Alternatives of one question share an uploader: only the files of uploaders no longer shown go
+    uploads.remove(*(page.hidden_uploads - page.shown_uploads))
+
+
+def checked_evidence(form):
+    """Labels of the ticked proof of age and proof of address checkboxes."""
+    return [label for label, get_mark in _EVIDENCE_CHECKS if get_mark(form) == 'X']
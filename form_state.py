@@ -0,0 +1,693 @@
+# Typed state of the ESFA form.
+#
+# The answers of one session used to be ~300 loose st.session_state
+# attributes, initialised one by one and looked up by hand in a 280-entry
+# placeholder_values literal.  They now live in one FormState, made of a
+# __slots__ dataclass per form section.  Each section owns its defaults and can
+# be reset in place; the document placeholders are projected from the
+# sections through PLACEHOLDER_FIELDS, compiled into getters at import.
+
+from dataclasses import MISSING, dataclass, field, fields
+from operator import attrgetter
+from typing import Any
+
+# LLDD and health problem types, each marked primary, secondary or tertiary (p157a-p175c)
+LLDD_TYPES = (
+    'vision_impairment', 'hearing_impairment', 'mobility_impairment', 'complex_disabilities',
+    'social_emotional_difficulties', 'mental_health_difficulty', 'moderate_learning_difficulty',
+    'severe_learning_difficulty', 'dyslexia', 'dyscalculia', 'autism_spectrum', 'aspergers',
+    'temporary_disability', 'speech_communication_needs', 'physical_disability',
+    'specific_learning_difficulty', 'medical_condition', 'other_learning_difficulty', 'other_disability',
+)
+LLDD_RANKS = ('primary', 'secondary', 'tertiary')
+LLDD_FIELDS = tuple(f'{lldd_type}_{rank}' for lldd_type in LLDD_TYPES for rank in LLDD_RANKS)
+
+
+def _blank_ethnicity_marks():
+    return {f'ethnicity_{i}': '' for i in range(31, 49)}
+
+
+class _Section:
+    __slots__ = ()
+
+    def reset(self):
+        """Put every field of the section back to its default."""
+        for section_field in fields(self):
+            if section_field.default is MISSING:
+                setattr(self, section_field.name, section_field.default_factory())
+            else:
+                setattr(self, section_field.name, section_field.default)
+
+
+@dataclass(slots=True)
+class Support(_Section):
+    """Step 1: the support option applied for."""
+
+    selected_option: Any = None
+
+
+@dataclass(slots=True)
+class PersonalDetails(_Section):
+    """Step 2: name, programme dates, gender and age."""
+
+    title_mr: str = ''
+    title_mrs: str = ''
+    title_miss: str = ''
+    title_ms: str = ''
+    title: str = ''
+    first_name: str = ''
+    middle_name: str = ''
+    family_name: str = ''
+    qualification: str = ''
+    start_date: Any = ''
+    end_date: Any = ''
+    gender_m: str = ''
+    gender_f: str = ''
+    other_gender: str = ''
+    other_gender_text: str = ''
+    gender: str = ''
+    date_of_birth: Any = ''
+    current_age: Any = ''
+    current_age_text: str = ''
+
+    @property
+    def learner_name(self):
+        return f"{self.first_name} {self.middle_name} {self.family_name}".strip()
+
+
+@dataclass(slots=True)
+class ContactDetails(_Section):
+    """Step 3: ethnicity, address and contact details."""
+
+    ethnicity_category: str = ''
+    ethnicity: str = ''
+    ethnicity_code: Any = ''
+    ethnicity_vars: dict = field(default_factory=_blank_ethnicity_marks)
+    national_insurance_number: str = ''
+    house_no_name_street: str = ''
+    suburb_village: str = ''
+    town_city: str = ''
+    county: str = ''
+    country_of_domicile: str = ''
+    current_postcode: str = ''
+    postcode_prior_enrollment: str = ''
+    email_address: str = ''
+    primary_telephone_number: str = ''
+    secondary_telephone_number: str = ''
+    next_of_kin: str = 'N/A'
+    emergency_contact_phone_number: str = 'N/A'
+
+
+@dataclass(slots=True)
+class Household(_Section):
+    """Step 4: household situation."""
+
+    no_member_employed_with_children: str = ''
+    no_member_employed_without_children: str = ''
+    single_adult_household_with_children: str = ''
+    unemployed_single_adult_household: str = ''
+    none_of_the_above: str = ''
+
+    @property
+    def household_filled(self):
+        """'filled' once any household situation is ticked."""
+        return 'filled' if any(_household_marks(self)) else ''
+
+
+@dataclass(slots=True)
+class LearningDifficulties(_Section):
+    """Step 5: LLDD and health problems, ex-offender and homeless."""
+
+    has_disability: str = ''
+    no_disability: str = ''
+    vision_impairment_primary: str = ''
+    vision_impairment_secondary: str = ''
+    vision_impairment_tertiary: str = ''
+    hearing_impairment_primary: str = ''
+    hearing_impairment_secondary: str = ''
+    hearing_impairment_tertiary: str = ''
+    mobility_impairment_primary: str = ''
+    mobility_impairment_secondary: str = ''
+    mobility_impairment_tertiary: str = ''
+    complex_disabilities_primary: str = ''
+    complex_disabilities_secondary: str = ''
+    complex_disabilities_tertiary: str = ''
+    social_emotional_difficulties_primary: str = ''
+    social_emotional_difficulties_secondary: str = ''
+    social_emotional_difficulties_tertiary: str = ''
+    mental_health_difficulty_primary: str = ''
+    mental_health_difficulty_secondary: str = ''
+    mental_health_difficulty_tertiary: str = ''
+    moderate_learning_difficulty_primary: str = ''
+    moderate_learning_difficulty_secondary: str = ''
+    moderate_learning_difficulty_tertiary: str = ''
+    severe_learning_difficulty_primary: str = ''
+    severe_learning_difficulty_secondary: str = ''
+    severe_learning_difficulty_tertiary: str = ''
+    dyslexia_primary: str = ''
+    dyslexia_secondary: str = ''
+    dyslexia_tertiary: str = ''
+    dyscalculia_primary: str = ''
+    dyscalculia_secondary: str = ''
+    dyscalculia_tertiary: str = ''
+    autism_spectrum_primary: str = ''
+    autism_spectrum_secondary: str = ''
+    autism_spectrum_tertiary: str = ''
+    aspergers_primary: str = ''
+    aspergers_secondary: str = ''
+    aspergers_tertiary: str = ''
+    temporary_disability_primary: str = ''
+    temporary_disability_secondary: str = ''
+    temporary_disability_tertiary: str = ''
+    speech_communication_needs_primary: str = ''
+    speech_communication_needs_secondary: str = ''
+    speech_communication_needs_tertiary: str = ''
+    physical_disability_primary: str = ''
+    physical_disability_secondary: str = ''
+    physical_disability_tertiary: str = ''
+    specific_learning_difficulty_primary: str = ''
+    specific_learning_difficulty_secondary: str = ''
+    specific_learning_difficulty_tertiary: str = ''
+    medical_condition_primary: str = ''
+    medical_condition_secondary: str = ''
+    medical_condition_tertiary: str = ''
+    other_learning_difficulty_primary: str = ''
+    other_learning_difficulty_secondary: str = ''
+    other_learning_difficulty_tertiary: str = ''
+    other_disability_primary: str = ''
+    other_disability_secondary: str = ''
+    other_disability_tertiary: str = ''
+    prefer_not_to_say: str = ''
+    additional_info: str = ''
+    ex_offender_y: str = ''
+    ex_offender_n: str = ''
+    ex_offender_choose_not_to_say: str = ''
+    homeless_y: str = ''
+    homeless_n: str = ''
+    homeless_choose_not_to_say: str = ''
+    # Raw widget answers
+    disability: Any = None
+    ex_offender: Any = None
+    homeless: Any = None
+
+    def any_condition(self):
+        """True when any LLDD or health problem type, or "Prefer not to say", is marked."""
+        return any(_lldd_marks(self)) or bool(self.prefer_not_to_say)
+
+
+@dataclass(slots=True)
+class Referral(_Section):
+    """Step 6: referral source."""
+
+    internally_sourced: Any = ''
+    recommendation: Any = ''
+    event: Any = ''
+    self_referral: Any = ''
+    family_friends: Any = ''
+    other: Any = ''
+    website: Any = ''
+    promotional_material: Any = ''
+    jobcentre_plus: Any = ''
+    internally_sourced_val: str = ''
+    recommendation_val: str = ''
+    event_val: str = ''
+    self_referral_val: str = ''
+    family_friends_val: str = ''
+    other_val: str = ''
+    website_val: str = ''
+    promotional_material_val: str = ''
+    jobcentre_plus_val: str = ''
+    specify_refereel: str = ''
+
+
+@dataclass(slots=True)
+class EmploymentStatus(_Section):
+    """Step 7: employment status and the unemployed/inactive/employed details."""
+
+    unemployed_val: str = ''
+    economically_inactive_val: str = ''
+    employed_val: str = ''
+    up_to_12_months_val: str = '-'
+    twelve_months_or_longer_val: str = '-'
+    jcp_dwp_val: str = '-'
+    careers_service_val: str = '-'
+    third_party_val: str = '-'
+    other_evidence_val: str = '-'
+    job_position: str = ''
+    job_start_date: Any = ''
+    inactive_status_val: str = 'N'
+    inactive_evidence_type_val: str = '-'
+    inactive_evidence_date_val: Any = '-'
+    employer_name_val: str = ''
+    employer_address_1_val: str = ''
+    employer_address_2_val: str = ''
+    employer_address_3_val: str = ''
+    employer_postcode_val: str = ''
+    employer_contact_name_val: str = ''
+    employer_contact_position_val: str = ''
+    employer_contact_email_val: str = ''
+    employer_contact_phone_val: str = ''
+    employer_edrs_number_val: str = ''
+    living_wage_val: str = ''
+    employment_hours_val_0: str = ''
+    employment_hours_val_6: str = ''
+    # Raw widget answers
+    employment_status: Any = None
+    unemployment_duration: Any = None
+    unemployment_evidence: Any = None
+    inactive_status: Any = None
+    living_wage: Any = None
+    employment_hours: Any = None
+
+
+@dataclass(slots=True)
+class Benefits(_Section):
+    """Step 7: benefits claimed."""
+
+    benefit_claim_date_val: Any = None
+    claiming_benefits_val: str = ''
+    sole_claimant_val: str = ''
+    benefits_list_val: str = ''
+    other_benefit_val: str = ''
+    universal_credit_val: str = ''
+    job_seekers_allowance_val: str = ''
+    employment_support_allowance_val: str = ''
+    incapacity_benefit_val: str = ''
+    personal_independence_payment_val: str = ''
+    # Raw widget answers
+    claiming_benefits: Any = None
+    sole_claimant: Any = None
+    benefits_list: Any = None
+
+
+@dataclass(slots=True)
+class RightToWork(_Section):
+    """Step 7, E01: residence, nationality and right to live and work in the UK."""
+
+    resident_y: str = ''
+    resident_n: str = ''
+    country_of_birth: str = ''
+    years_in_uk: Any = ''
+    nationality: str = '-'
+    hold_settled_status: str = '-'
+    hold_pre_settled_status: str = '-'
+    hold_leave_to_remain: str = '-'
+    not_nationality: str = '-'
+    passport_non_eu: str = '-'
+    letter_uk_immigration: str = '-'
+    passport_endorsed: str = '-'
+    identity_card: str = '-'
+    country_of_issue: str = '-'
+    id_document_reference_number: str = '-'
+    e01_date_of_issue: Any = '-'
+    e01_date_of_expiry: Any = '-'
+    e01_additional_notes: str = '-'
+    full_uk_passport: str = '-'
+    full_eu_passport: str = '-'
+    national_identity_card: str = '-'
+    # Raw widget answers
+    resident: Any = None
+    british_or_not: Any = None
+    selected_option_nationality: Any = None
+    settled_status: Any = None
+    passport_non_eu_checked: Any = None
+    document_type: Any = None
+
+
+@dataclass(slots=True)
+class ProofOfAge(_Section):
+    """Step 7, E02: proof of age."""
+
+    full_passport_eu: str = ''
+    national_id_card_eu: str = ''
+    firearms_certificate: str = ''
+    birth_adoption_certificate: str = ''
+    e02_drivers_license: str = ''
+    edu_institution_letter: str = ''
+    e02_employment_contract: str = ''
+    state_benefits_letter: str = ''
+    pension_statement: str = ''
+    northern_ireland_voters_card: str = ''
+    e02_other_evidence_text: str = ''
+    e02_date_of_issue: Any = ''
+
+    @property
+    def e02_filled(self):
+        """'Filled' once any proof of age is ticked or other evidence is stated."""
+        return 'Filled' if 'X' in _proof_of_age_marks(self) or self.e02_other_evidence_text != '' else ''
+
+
+@dataclass(slots=True)
+class ProofOfAddress(_Section):
+    """Step 7, E03: proof of residence."""
+
+    e03_drivers_license: str = ''
+    bank_statement: str = ''
+    e03_pension_statement: str = ''
+    mortgage_statement: str = ''
+    utility_bill: str = ''
+    council_tax_statement: str = ''
+    electoral_role_evidence: str = ''
+    homeowner_letter: str = ''
+    e03_date_of_issue: Any = ''
+    e03_other_evidence_text: str = ''
+
+    @property
+    def e03_filled(self):
+        """'Filled' once any proof of address is ticked or other evidence is stated."""
+        return 'Filled' if 'X' in _proof_of_address_marks(self) or self.e03_other_evidence_text != '' else ''
+
+
+@dataclass(slots=True)
+class EmploymentEvidence(_Section):
+    """Step 7, E04: employment status evidence."""
+
+    latest_payslip: str = '-'
+    e04_employment_contract: str = '-'
+    confirmation_from_employer: str = '-'
+    redundancy_notice: str = '-'
+    sa302_declaration: str = '-'
+    ni_contributions: str = '-'
+    business_records: str = '-'
+    companies_house_records: str = '-'
+    other_evidence_employed: str = '-'
+    unemployed: str = '-'
+    e04_date_of_issue: Any = ''
+    # Raw widget answers
+    selected_main_option: Any = None
+    selected_self_employed_option: Any = None
+
+
+@dataclass(slots=True)
+class Training(_Section):
+    """Step 8: qualification or training so far and the p58-p64 level marks."""
+
+    qualification_or_training_y: str = 'Y'
+    qualification_or_training_n: str = ''
+    course_details: str = ''
+    funding_details: str = ''
+    p58: str = '-'
+    p59: str = '-'
+    p60: str = '-'
+    p60z: str = '-'
+    p60a: str = '-'
+    p61: str = '-'
+    p61z: str = '-'
+    p61a: str = '-'
+    p62: str = '-'
+    p63: str = '-'
+    p63z: str = '-'
+    p63a: str = '-'
+    p63b: str = '-'
+    p64: str = '-'
+    # Raw widget answers
+    qualification_or_training: Any = None
+    participant_declaration: Any = None
+
+
+@dataclass(slots=True)
+class Skills(_Section):
+    """Step 9: current skills, experience and IAG."""
+
+    p93: str = '-'
+    p94: str = '-'
+    p95: str = '-'
+    p96: str = '-'
+    p97: str = '-'
+    p98: str = '-'
+    job_role_activities: str = 'No job.'
+    career_aspirations: str = ''
+    training_qualifications_needed: str = '    '
+    barriers_to_achieving_aspirations: str = '    '
+    selected_levels: Any = ''
+    current_job: str = ''
+
+
+@dataclass(slots=True)
+class PrivacyNotice(_Section):
+    """Step 10: contact preferences."""
+
+    contact_surveys_val: str = ''
+    contact_phone_val: str = ''
+    contact_email_val: str = ''
+    contact_post_val: str = ''
+    # Raw widget answers
+    contact_surveys: Any = None
+    contact_phone: Any = None
+    contact_email: Any = None
+    contact_post: Any = None
+
+
+@dataclass(slots=True)
+class Declaration(_Section):
+    """Step 11: declaration and signatures."""
+
+    tp_name: str = ''
+    # Raw widget answers
+    date_signed: Any = None
+    tp_position: Any = None
+
+
+_lldd_marks = attrgetter(*LLDD_FIELDS)
+_household_marks = attrgetter(
+    'no_member_employed_with_children', 'no_member_employed_without_children',
+    'single_adult_household_with_children', 'unemployed_single_adult_household', 'none_of_the_above')
+_proof_of_age_marks = attrgetter(
+    'full_passport_eu', 'national_id_card_eu', 'firearms_certificate', 'birth_adoption_certificate',
+    'e02_drivers_license', 'edu_institution_letter', 'e02_employment_contract', 'state_benefits_letter',
+    'pension_statement', 'northern_ireland_voters_card')
+_proof_of_address_marks = attrgetter(
+    'e03_drivers_license', 'bank_statement', 'e03_pension_statement', 'mortgage_statement', 'utility_bill',
+    'council_tax_statement', 'electoral_role_evidence', 'homeowner_letter')
+
+@dataclass(slots=True)
+class FormState:
+    """Every answer of one form session, grouped by section."""
+
+    support: Support = field(default_factory=Support)
+    personal: PersonalDetails = field(default_factory=PersonalDetails)
+    contact: ContactDetails = field(default_factory=ContactDetails)
+    household: Household = field(default_factory=Household)
+    lldd: LearningDifficulties = field(default_factory=LearningDifficulties)
+    referral: Referral = field(default_factory=Referral)
+    employment: EmploymentStatus = field(default_factory=EmploymentStatus)
+    benefits: Benefits = field(default_factory=Benefits)
+    right_to_work: RightToWork = field(default_factory=RightToWork)
+    proof_of_age: ProofOfAge = field(default_factory=ProofOfAge)
+    proof_of_address: ProofOfAddress = field(default_factory=ProofOfAddress)
+    employment_evidence: EmploymentEvidence = field(default_factory=EmploymentEvidence)
+    training: Training = field(default_factory=Training)
+    skills: Skills = field(default_factory=Skills)
+    privacy: PrivacyNotice = field(default_factory=PrivacyNotice)
+    declaration: Declaration = field(default_factory=Declaration)
+
+    def to_placeholders(self):
+        """Return {placeholder id: value} for the document template."""
+        return {placeholder: get(self) for placeholder, get in _PROJECTION}
+
+
+def _ethnicity_mark(number):
+    return lambda form: form.contact.ethnicity_vars[f'ethnicity_{number}']
+
+
+def _course_and_funding(form):
+    return form.training.course_details + ' ' + form.training.funding_details
+
+
+def _selected_level_count(form):
+    return len(form.skills.selected_levels)
+
+
+# Placeholder id -> 'section.field', or a function of the FormState for derived values
+PLACEHOLDER_FIELDS = {
+    'p241': 'personal.learner_name',
+    'p242': 'personal.qualification',
+    'p243': 'personal.start_date',
+    'p244': 'personal.end_date',
+    'p110': 'personal.title_mr',
+    'p111': 'personal.title_mrs',
+    'p112': 'personal.title_miss',
+    'p113': 'personal.title_ms',
+    'p1': 'personal.first_name',
+    'p2': 'personal.middle_name',
+    'p3': 'personal.family_name',
+    'p114': 'personal.gender_m',
+    'p115': 'personal.gender_f',
+    'p116': 'personal.other_gender',
+    'p117': 'personal.other_gender_text',
+    'p4': 'personal.date_of_birth',
+    'p118': 'personal.current_age',
+    **{f'p{119 + i}': _ethnicity_mark(31 + i) for i in range(18)},
+    'p137': 'contact.national_insurance_number',
+    'p138': 'contact.house_no_name_street',
+    'p139': 'contact.suburb_village',
+    'p140': 'contact.town_city',
+    'p141': 'contact.county',
+    'p142': 'contact.country_of_domicile',
+    'p143': 'contact.current_postcode',
+    'p144': 'contact.postcode_prior_enrollment',
+    'p145': 'contact.email_address',
+    'p146': 'contact.primary_telephone_number',
+    'p147': 'contact.secondary_telephone_number',
+    'p148': 'contact.next_of_kin',
+    'p149': 'contact.emergency_contact_phone_number',
+    'p150': 'household.no_member_employed_with_children',
+    'p151': 'household.no_member_employed_without_children',
+    'p152': 'household.single_adult_household_with_children',
+    'p153': 'household.unemployed_single_adult_household',
+    'p154': 'household.none_of_the_above',
+    'p155': 'lldd.has_disability',
+    'p156': 'lldd.no_disability',
+    **{f'p{157 + i}{column}': f'lldd.{lldd_type}_{rank}'
+       for i, lldd_type in enumerate(LLDD_TYPES) for column, rank in zip('abc', LLDD_RANKS)},
+    'p176': 'lldd.prefer_not_to_say',
+    'p177': 'lldd.additional_info',
+    'p178': 'lldd.ex_offender_y',
+    'p179': 'lldd.ex_offender_n',
+    'p180': 'lldd.ex_offender_choose_not_to_say',
+    'p189': 'lldd.homeless_y',
+    'p190': 'lldd.homeless_n',
+    'p191': 'lldd.homeless_choose_not_to_say',
+    'p181': 'referral.internally_sourced_val',
+    'p182': 'referral.recommendation_val',
+    'p183': 'referral.event_val',
+    'p184': 'referral.self_referral_val',
+    'p185': 'referral.family_friends_val',
+    'p186': 'referral.other_val',
+    'p187': 'referral.website_val',
+    'p188': 'referral.promotional_material_val',
+    'p188a': 'referral.jobcentre_plus_val',
+    'p192': 'employment.unemployed_val',
+    'p193': 'employment.economically_inactive_val',
+    'p194': 'employment.employed_val',
+    'p195': 'employment.up_to_12_months_val',
+    'p196': 'employment.twelve_months_or_longer_val',
+    'p197': 'employment.jcp_dwp_val',
+    'p198': 'employment.careers_service_val',
+    'p199': 'employment.third_party_val',
+    'p200': 'employment.other_evidence_val',
+    'p201': 'employment.inactive_status_val',
+    'p202': 'employment.inactive_evidence_type_val',
+    'p203': 'employment.inactive_evidence_date_val',
+    'p204': 'employment.employer_name_val',
+    'p205': 'employment.employer_address_1_val',
+    'p206': 'employment.employer_address_2_val',
+    'p207': 'employment.employer_address_3_val',
+    'p208': 'employment.employer_postcode_val',
+    'p209': 'employment.employer_contact_name_val',
+    'p210': 'employment.employer_contact_position_val',
+    'p211': 'employment.employer_contact_email_val',
+    'p212': 'employment.employer_contact_phone_val',
+    'p213': 'employment.employer_edrs_number_val',
+    'p214': 'employment.living_wage_val',
+    'p215a': 'employment.employment_hours_val_0',
+    'p215b': 'employment.employment_hours_val_6',
+    'p216': 'benefits.claiming_benefits_val',
+    'p217': 'benefits.sole_claimant_val',
+    'p218': 'benefits.universal_credit_val',
+    'p219': 'benefits.job_seekers_allowance_val',
+    'p220': 'benefits.employment_support_allowance_val',
+    'p221': 'benefits.incapacity_benefit_val',
+    'p222': 'benefits.personal_independence_payment_val',
+    'p223': 'benefits.other_benefit_val',
+    'p224': 'benefits.benefit_claim_date_val',
+    'p225': 'privacy.contact_surveys_val',
+    'p226': 'privacy.contact_phone_val',
+    'p227': 'privacy.contact_email_val',
+    'p228': 'privacy.contact_post_val',
+    'p5': 'right_to_work.nationality',
+    'p6': 'right_to_work.full_uk_passport',
+    'p7': 'right_to_work.full_eu_passport',
+    'p8': 'right_to_work.national_identity_card',
+    'p9': 'right_to_work.hold_settled_status',
+    'p10': 'right_to_work.hold_pre_settled_status',
+    'p11': 'right_to_work.hold_leave_to_remain',
+    'p12': 'right_to_work.not_nationality',
+    'p13': 'right_to_work.passport_non_eu',
+    'p14': 'right_to_work.letter_uk_immigration',
+    'p15': 'right_to_work.passport_endorsed',
+    'p16': 'right_to_work.identity_card',
+    'p17': 'right_to_work.country_of_issue',
+    'p18': 'right_to_work.id_document_reference_number',
+    'p19': 'right_to_work.e01_date_of_issue',
+    'p20': 'right_to_work.e01_date_of_expiry',
+    'p21': 'right_to_work.e01_additional_notes',
+    'p22': 'proof_of_age.full_passport_eu',
+    'p23': 'proof_of_age.national_id_card_eu',
+    'p24': 'proof_of_age.firearms_certificate',
+    'p25': 'proof_of_age.birth_adoption_certificate',
+    'p26': 'proof_of_age.e02_drivers_license',
+    'p27': 'proof_of_age.edu_institution_letter',
+    'p28': 'proof_of_age.e02_employment_contract',
+    'p29': 'proof_of_age.state_benefits_letter',
+    'p30': 'proof_of_age.pension_statement',
+    'p31': 'proof_of_age.northern_ireland_voters_card',
+    'p32': 'proof_of_age.e02_other_evidence_text',
+    'p33': 'proof_of_age.e02_date_of_issue',
+    'p34': 'proof_of_address.e03_drivers_license',
+    'p35': 'proof_of_address.bank_statement',
+    'p36': 'proof_of_age.pension_statement',
+    'p37': 'proof_of_address.mortgage_statement',
+    'p38': 'proof_of_address.utility_bill',
+    'p39': 'proof_of_address.council_tax_statement',
+    'p40': 'proof_of_address.electoral_role_evidence',
+    'p41': 'proof_of_address.homeowner_letter',
+    'p42': 'proof_of_address.e03_date_of_issue',
+    'p43': 'proof_of_address.e03_other_evidence_text',
+    'p44': 'employment_evidence.latest_payslip',
+    'p45': 'employment_evidence.e04_employment_contract',
+    'p46': 'employment_evidence.confirmation_from_employer',
+    'p47': 'employment_evidence.redundancy_notice',
+    'p48': 'employment_evidence.sa302_declaration',
+    'p49': 'employment_evidence.ni_contributions',
+    'p50': 'employment_evidence.business_records',
+    'p51': 'employment_evidence.companies_house_records',
+    'p52': 'employment_evidence.other_evidence_employed',
+    'p53': 'employment_evidence.unemployed',
+    'p54': 'employment_evidence.e04_date_of_issue',
+    'p55': 'training.qualification_or_training_y',
+    'p56': 'training.qualification_or_training_n',
+    'p57': _course_and_funding,
+    'p58': 'training.p58',
+    'p59': 'training.p59',
+    'p60': 'training.p60',
+    'p61': 'training.p61',
+    'p62': 'training.p62',
+    'p63': 'training.p63',
+    'p64': 'training.p64',
+    'p60z': 'training.p60z',
+    'p60a': 'training.p60a',
+    'p61z': 'training.p61z',
+    'p61a': 'training.p61a',
+    'p63z': 'training.p63z',
+    'p63a': 'training.p63a',
+    'p63b': 'training.p63b',
+    'p65': 'support.selected_option',
+    'p93': 'skills.p93',
+    'p94': 'skills.p94',
+    'p95': 'skills.p95',
+    'p96': 'skills.p96',
+    'p97': 'skills.p97',
+    'p98': 'skills.p98',
+    'p99': 'skills.job_role_activities',
+    'p100': 'skills.career_aspirations',
+    'p101': 'skills.training_qualifications_needed',
+    'p102': 'skills.barriers_to_achieving_aspirations',
+    'p231': 'declaration.date_signed',
+    'p300': 'household.household_filled',
+    'p301': 'proof_of_age.e02_filled',
+    'p302': 'proof_of_address.e03_filled',
+    'p303': _selected_level_count,
+    'p305': 'referral.specify_refereel',
+    'p232': 'declaration.tp_name',
+    'p233': 'declaration.tp_position',
+    'p235': 'employment.job_position',
+    'p236': 'employment.job_start_date',
+    'p237y': 'right_to_work.resident_y',
+    'p237n': 'right_to_work.resident_n',
+    'p238': 'right_to_work.country_of_birth',
+    'p239': 'right_to_work.years_in_uk',
+}
+
+_PROJECTION = tuple((placeholder, attrgetter(source) if isinstance(source, str) else source)
+                    for placeholder, source in PLACEHOLDER_FIELDS.items())
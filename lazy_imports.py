@@ -0,0 +1,155 @@
+# Deferred imports for the ESFA form app.
+#
+# Streamlit runs app.py from the top for every new session, and its imports
+# pulled in python-docx and lxml (rendering), PIL, numpy and reportlab
+# (imaging), smtplib, email and tenacity (mail) and the drawable canvas before
+# the support options of step 1 could be shown, although only the signature
+# and submit steps use them.  app.py binds those modules to LazyModule
+# stand-ins that import on first attribute access, and warm_up() imports them in
+# a background thread once the first page is on screen, so a later step rarely
+# has to wait for them.
+#
+# `python lazy_imports.py` times the imports in fresh interpreters with
+# `python -X importtime` and reports what the first page no longer pays for.
+
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Modules of each subsystem, in the order warm_up() imports them
+SUBSYSTEMS = {
+    'rendering': ('docx_template', 'docx_stream'),
+    'imaging': ('signature', 'attachments', 'evidence'),
+    'mail': ('email.message', 'mailer', 'delivery', 'outbox', 'digests', 'submissions'),
+    'canvas': ('streamlit_drawable_canvas',),
+}
+# What app.py still imports before step 1 is shown, besides streamlit itself
+FIRST_PAGE_MODULES = ('config', 'form_schema', 'form_state', 'uploads', 'lazy_imports')
+
+_load_times = {}   # module name -> seconds its first import took
+_warm_up = None
+_warm_up_lock = threading.Lock()
+
+
+def load(name):
+    """Import module name, recording how long the first import took."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    _load_times.setdefault(name, time.perf_counter() - started)
+    return module
+
+
+def load_times():
+    """{module name: seconds} of the modules imported through load() so far."""
+    return dict(_load_times)
+
+
+class LazyModule:
+    """Stands in for module name and imports it on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = load(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy(name):
+    return LazyModule(name)
+
+
+class _WarmUp(threading.Thread):
+    def __init__(self, subsystems, then):
+        super().__init__(name='import-warm-up', daemon=True)
+        self.subsystems = subsystems
+        self.then = then
+
+    def run(self):
+        started = time.perf_counter()
+        for subsystem in self.subsystems:
+            for name in SUBSYSTEMS[subsystem]:
+                try:
+                    load(name)
+                except Exception as e:
+                    # Left to fail again, visibly, where it is first used
+                    print(f"Warm-up import of {name} failed: {e}")
+        print(f"Imports warmed up in {time.perf_counter() - started:.2f} s")
+        if self.then is not None:
+            try:
+                self.then()
+            except Exception as e:
+                print(f"Starting the background services failed: {e}")
+
+
+def warm_up(then=None, subsystems=None):
+    """Import the deferred subsystems in a background thread, once per process, then call then()."""
+    global _warm_up
+    with _warm_up_lock:
+        if _warm_up is None:
+            _warm_up = _WarmUp(tuple(subsystems or SUBSYSTEMS), then)
+            _warm_up.start()
+    return _warm_up
+
+
+def import_time(modules, preload=('streamlit',)):
+    """Microseconds `python -X importtime` reports for importing modules in a fresh interpreter.
+
+    The preload modules are imported first and not counted, so whatever they
+    already pull in (streamlit brings numpy and PIL) is not charged to modules.
+    Modules that are not installed are skipped.
+    """
+    code = ''.join(f"try:\n    __import__({name!r})\nexcept ImportError:\n    pass\n"
+                   for name in (*preload, *modules))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    top_level = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit() and not name[1:].startswith(' '):
+            top_level.append((name.strip(), int(cumulative)))
+    # A package is reported after its submodules, so a dotted preload ends at its root
+    roots = {name.split('.')[0] for name in preload}
+    start = max((i + 1 for i, (name, _) in enumerate(top_level) if name in roots), default=0)
+    return sum(cumulative for _, cumulative in top_level[start:])
+
+
+def report(repeat=3):
+    """Print the import time of each deferred subsystem and of what step 1 still imports."""
+    def best(modules):
+        return min(import_time(modules) for _ in range(repeat)) / 1000
+
+    print(f"Import time after `import streamlit` (python -X importtime, best of {repeat}):")
+    for subsystem, modules in SUBSYSTEMS.items():
+        print(f"  {subsystem:<10} {best(modules):8.1f} ms  {', '.join(modules)}")
+    deferred = [name for modules in SUBSYSTEMS.values() for name in modules]
+    print(f"  {'deferred':<10} {best(deferred):8.1f} ms  no longer imported before step 1")
+    print(f"  {'step 1':<10} {best(FIRST_PAGE_MODULES):8.1f} ms  {', '.join(FIRST_PAGE_MODULES)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the import time the deferred imports save.')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement; the fastest is shown')
+    args = parser.parse_args()
+    report(args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+# Pooled SMTP delivery for the ESFA form.
+#
+# Every submission used to open its own connection to smtp.office365.com and
+# pay the TCP, STARTTLS and AUTH handshakes for a single message.  The pool
+# keeps a bounded number of authenticated sessions per account and hands them
+# to the submission workers in turn.  A session that sat idle is probed with
+# NOOP before reuse, and a send that hits a dropped session is retried once on
+# a fresh connection.
+#
+# The host, port and STARTTLS use are parameters, so the pool can be pointed at
+# a local SMTP stand-in (e.g. `python -m aiosmtpd -n -l localhost:8025`).
+
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+SMTP_HOST = os.environ.get('SMTP_HOST', 'smtp.office365.com')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '587'))
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', '1') != '0'
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', '2'))
+SMTP_TIMEOUT = 60
+# Office 365 advertises SIZE 157286400 in EHLO but mailboxes accept 35 MB by default;
+# the smaller of the two is used as the message size limit
+SMTP_MAX_MESSAGE_SIZE = int(os.environ.get('SMTP_MAX_MESSAGE_SIZE', str(35 * 1024 * 1024)))
+# Idle sessions are probed with NOOP after this many seconds ...
+SMTP_PROBE_AFTER = 15
+# ... and closed after this many, before the server drops them on its own
+SMTP_MAX_IDLE = 240
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class SMTPPoolStats:
+    """Connection reuse counters for one pool."""
+
+    def __init__(self):
+        self.connects = 0
+        self.reuses = 0
+        self.probes = 0
+        self.reconnects = 0
+        self.messages = 0
+
+
+class SMTPConnectionPool:
+    """Bounded pool of logged-in SMTP sessions for one account."""
+
+    def __init__(self, host, port, username=None, password=None, size=SMTP_POOL_SIZE, starttls=True,
+                 timeout=SMTP_TIMEOUT, probe_after=SMTP_PROBE_AFTER, max_idle=SMTP_MAX_IDLE):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.probe_after = probe_after
+        self.max_idle = max_idle
+        self.stats = SMTPPoolStats()
+        self.advertised_size = None   # SIZE from EHLO once connected, 0 if not advertised
+        self._idle = []   # (smtplib.SMTP, last used), most recently used last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.starttls:
+                server.starttls()
+                server.ehlo()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            _close_quietly(server)
+            raise
+        self.stats.connects += 1
+        size = server.esmtp_features.get('size', '')
+        self.advertised_size = int(size) if size.isdigit() else 0
+        return server
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            idle = time.monotonic() - last_used
+            if idle > self.max_idle:
+                _close_quietly(server)
+                continue
+            if idle > self.probe_after:
+                self.stats.probes += 1
+                if not _is_alive(server):
+                    _close_quietly(server)
+                    continue
+            self.stats.reuses += 1
+            return server
+        return self._connect()
+
+    def _checkin(self, server):
+        with self._lock:
+            self._idle.append((server, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Borrow a logged-in session; it is closed instead of returned if it failed."""
+        self._slots.acquire()
+        try:
+            server = self._checkout()
+            try:
+                yield server
+            except OSError as e:
+                # A refused message leaves a usable session once the transaction is reset
+                if is_connection_error(e) or not _is_reset(server):
+                    _close_quietly(server)
+                else:
+                    self._checkin(server)
+                raise
+            except BaseException:
+                # E.g. a message that could not be built or a KeyboardInterrupt: the
+                # session may be mid-transaction, so it is closed rather than reused
+                _close_quietly(server)
+                raise
+            else:
+                self._checkin(server)
+        finally:
+            self._slots.release()
+
+    def _send(self, send):
+        try:
+            with self.connection() as server:
+                send(server)
+        except OSError as e:
+            if not is_connection_error(e):
+                raise
+            print(f"SMTP session to {self.host} lost ({e}), reconnecting")
+            self.stats.reconnects += 1
+            with self.connection() as server:
+                send(server)
+        self.stats.messages += 1
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        """Send msg over a pooled session, reconnecting once if the session was dropped."""
+        self._send(lambda server: server.send_message(msg, from_addr, to_addrs))
+
+    def sendmail(self, from_addr, to_addrs, data):
+        """Send already serialised message bytes as they are, like smtplib.SMTP.sendmail."""
+        self._send(lambda server: server.sendmail(from_addr, to_addrs, data))
+
+    def message_size_limit(self, connect=True):
+        """Largest message the server takes: its EHLO SIZE, capped at SMTP_MAX_MESSAGE_SIZE.
+
+        With connect=False no session is opened to learn the SIZE: until one has
+        been, SMTP_MAX_MESSAGE_SIZE is assumed.
+        """
+        if self.advertised_size is None and connect:
+            try:
+                with self.connection():
+                    pass
+            except OSError as e:
+                print(f"Unable to read the SIZE limit from {self.host}: {e}")
+        if self.advertised_size:
+            return min(self.advertised_size, SMTP_MAX_MESSAGE_SIZE)
+        return SMTP_MAX_MESSAGE_SIZE
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            _close_quietly(server)
+
+
+def is_connection_error(error):
+    """True when error means the SMTP session is gone, rather than the message being refused."""
+    # smtplib.SMTPException derives from OSError, so socket errors are told apart explicitly
+    return isinstance(error, smtplib.SMTPServerDisconnected) or (
+        isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException))
+
+
+def _is_alive(server):
+    try:
+        return server.noop()[0] == 250
+    except OSError:
+        return False
+
+
+def _is_reset(server):
+    try:
+        return server.rset()[0] == 250
+    except OSError:
+        return False
+
+
+def _close_quietly(server):
+    try:
+        server.quit()
+    except OSError:
+        server.close()
+
+
+def get_smtp_pool(username, password, host=None, port=None, starttls=None):
+    """Return the process-wide pool for this account, creating it on first use."""
+    host = host or SMTP_HOST
+    port = port or SMTP_PORT
+    starttls = SMTP_STARTTLS if starttls is None else starttls
+    key = (host, port, username, password, starttls)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SMTPConnectionPool(host, port, username, password, starttls=starttls)
+            _pools[key] = pool
+    return pool
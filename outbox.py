@@ -0,0 +1,362 @@
+# Durable outbox for the ESFA form emails.
+#
+# Each submission email is built once and spooled maildir-style under
+# OUTBOX_DIR before any delivery is attempted:
+#
+#   tmp/     being written; never read by the flusher
+#   new/     complete <key>.eml (RFC 5322 bytes) + <key>.json metadata sidecar
+#   cur/     delivered, kept for OUTBOX_SENT_TTL so a replayed key is not sent twice
+#   failed/  gave up after OUTBOX_MAX_ATTEMPTS
+#
+# Files are written into tmp/ and renamed into new/, the sidecar last, so a
+# crash never leaves a half-written message visible.  A flusher (a thread in the
+# app, or `python outbox.py` as its own process) claims entries by renaming the
+# sidecar, resends the prebuilt bytes with backoff and moves them to cur/.  A
+# retry never re-renders the form or rebuilds the MIME message.
+
+import argparse
+import email.policy
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import formatdate
+
+from config import get_config
+from delivery import get_delivery_lane, get_delivery_scheduler
+from mailer import get_smtp_pool
+
+OUTBOX_DIR = os.environ.get('OUTBOX_DIR', '.outbox')
+OUTBOX_FLUSH_INTERVAL = int(os.environ.get('OUTBOX_FLUSH_INTERVAL', '30'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '12'))
+# Retry delays grow 60 s, 120 s, 240 s, ... up to an hour
+OUTBOX_RETRY_BASE = 60
+OUTBOX_RETRY_MAX = 3600
+# A claim older than this belongs to a flusher that died mid-send
+OUTBOX_CLAIM_TIMEOUT = 900
+OUTBOX_SENT_TTL = 7 * 24 * 3600
+
+TMP, NEW, CUR, FAILED = 'tmp', 'new', 'cur', 'failed'
+CLAIM_SUFFIX = '.sending'
+
+_flushers = {}
+_flushers_lock = threading.Lock()
+
+
+class OutboxEntry:
+    """A spooled message: its .eml path and the metadata sidecar."""
+
+    def __init__(self, outbox_dir, key, meta, state):
+        self.outbox_dir = outbox_dir
+        self.key = key
+        self.meta = meta
+        self.state = state  # NEW, CUR or FAILED
+
+    @property
+    def eml_path(self):
+        return os.path.join(self.outbox_dir, self.state, f'{self.key}.eml')
+
+    @property
+    def sender(self):
+        return self.meta['sender']
+
+    @property
+    def recipients(self):
+        return self.meta['recipients']
+
+    @property
+    def lane(self):
+        return self.meta.get('lane')
+
+    def read_bytes(self):
+        with open(self.eml_path, 'rb') as f:
+            return f.read()
+
+
+def _outbox_dir(outbox_dir):
+    outbox_dir = outbox_dir or OUTBOX_DIR
+    for state in (TMP, NEW, CUR, FAILED):
+        os.makedirs(os.path.join(outbox_dir, state), exist_ok=True)
+    return outbox_dir
+
+
+def _write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _write_sidecar(path, meta):
+    tmp_path = f'{path}.tmp'
+    _write_file(tmp_path, json.dumps(meta, indent=1).encode('utf-8'))
+    os.replace(tmp_path, path)
+
+
+def _read_sidecar(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def find_entry(key, outbox_dir=None):
+    """Return the OutboxEntry spooled under key in any state, or None."""
+    outbox_dir = _outbox_dir(outbox_dir)
+    for state, name in ((NEW, f'{key}.json'), (NEW, f'{key}.json{CLAIM_SUFFIX}'),
+                        (CUR, f'{key}.json'), (FAILED, f'{key}.json')):
+        path = os.path.join(outbox_dir, state, name)
+        try:
+            return OutboxEntry(outbox_dir, key, _read_sidecar(path), state)
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def spool_message(msg, key, sender, recipients, outbox_dir=None, lane=None):
+    """Write msg to the outbox under key and return its OutboxEntry.
+
+    lane names the delivery lane (partner) the flusher sends it on.  A key that
+    was spooled before (pending, delivered or failed) is not written again; the
+    existing entry is returned instead.
+    """
+    outbox_dir = _outbox_dir(outbox_dir)
+    existing = find_entry(key, outbox_dir)
+    if existing is not None:
+        print(f"Outbox entry {key} already spooled ({existing.state})")
+        return existing
+
+    if 'Date' not in msg:
+        msg['Date'] = formatdate(localtime=True)
+    if 'Message-ID' not in msg:
+        domain = sender.rpartition('@')[2] or 'localhost'
+        # Stable id, so a message that does get sent twice is recognisable as one
+        msg['Message-ID'] = f'<{key}@{domain}>'
+    data = msg.as_bytes(policy=email.policy.SMTP)
+    meta = {
+        'key': key,
+        'sender': sender,
+        'recipients': list(recipients),
+        'lane': lane,
+        'subject': str(msg.get('Subject', '')),
+        'size': len(data),
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'created': time.time(),
+        'attempts': 0,
+        'next_attempt': 0,
+        'last_error': None,
+    }
+
+    tmp_eml = os.path.join(outbox_dir, TMP, f'{key}.eml')
+    tmp_json = os.path.join(outbox_dir, TMP, f'{key}.json')
+    _write_file(tmp_eml, data)
+    _write_file(tmp_json, json.dumps(meta, indent=1).encode('utf-8'))
+    os.replace(tmp_eml, os.path.join(outbox_dir, NEW, f'{key}.eml'))
+    # The sidecar arriving in new/ is what makes the entry visible to the flusher
+    os.replace(tmp_json, os.path.join(outbox_dir, NEW, f'{key}.json'))
+    print(f"Spooled outbox entry {key}: {len(data)} bytes for {len(meta['recipients'])} recipient(s)")
+    wake_flusher(outbox_dir)
+    return OutboxEntry(outbox_dir, key, meta, NEW)
+
+
+def _retry_delay(attempts):
+    return min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+
+
+def _move(outbox_dir, key, state, meta):
+    # The sidecar goes first: once it is in cur/ or failed/ the key is never sent again
+    _write_sidecar(os.path.join(outbox_dir, state, f'{key}.json'), meta)
+    os.replace(os.path.join(outbox_dir, NEW, f'{key}.eml'), os.path.join(outbox_dir, state, f'{key}.eml'))
+    _discard_pending(outbox_dir, key)
+
+
+def _discard_pending(outbox_dir, key):
+    for name in (f'{key}.eml', f'{key}.json', f'{key}.json{CLAIM_SUFFIX}'):
+        try:
+            os.remove(os.path.join(outbox_dir, NEW, name))
+        except FileNotFoundError:
+            pass
+
+
+def _is_settled(outbox_dir, key):
+    return any(os.path.exists(os.path.join(outbox_dir, state, f'{key}.json')) for state in (CUR, FAILED))
+
+
+def deliver_entry(key, send, outbox_dir=None, force=False):
+    """Claim the pending entry under key and pass it to send(entry).
+
+    Returns True once the entry is delivered (now or earlier), False when it is
+    left for a later retry or was claimed by another flusher.  force ignores the
+    entry's backoff.
+    """
+    outbox_dir = _outbox_dir(outbox_dir)
+    sidecar_path = os.path.join(outbox_dir, NEW, f'{key}.json')
+    claim_path = sidecar_path + CLAIM_SUFFIX
+    if _is_settled(outbox_dir, key):
+        # Left over from a flusher that stopped half way through moving the entry;
+        # a live claim means the move is still in progress
+        if not os.path.exists(claim_path):
+            _discard_pending(outbox_dir, key)
+        return os.path.exists(os.path.join(outbox_dir, CUR, f'{key}.json'))
+    try:
+        meta = _read_sidecar(sidecar_path)
+        if not force and meta['next_attempt'] > time.time():
+            return False
+        # Renaming is the claim: only one flusher wins it
+        os.rename(sidecar_path, claim_path)
+        os.utime(claim_path)  # claim age, not spool age, decides when it counts as stale
+    except FileNotFoundError:
+        return False
+
+    entry = OutboxEntry(outbox_dir, key, meta, NEW)
+    meta['attempts'] += 1
+    try:
+        send(entry)
+    except Exception as e:
+        meta['last_error'] = f'{type(e).__name__}: {e}'
+        if meta['attempts'] >= OUTBOX_MAX_ATTEMPTS:
+            _move(outbox_dir, key, FAILED, meta)
+            print(f"Outbox entry {key} failed after {meta['attempts']} attempt(s): {e}")
+        else:
+            meta['next_attempt'] = time.time() + _retry_delay(meta['attempts'])
+            _write_sidecar(sidecar_path, meta)
+            os.remove(claim_path)
+            print(f"Outbox entry {key} attempt {meta['attempts']} failed ({e}), "
+                  f"retrying in {_retry_delay(meta['attempts'])}s")
+        return False
+
+    meta['sent_at'] = time.time()
+    _move(outbox_dir, key, CUR, meta)
+    print(f"Outbox entry {key} delivered on attempt {meta['attempts']}")
+    return True
+
+
+def _release_stale_claims(outbox_dir):
+    new_dir = os.path.join(outbox_dir, NEW)
+    for name in os.listdir(new_dir):
+        if not name.endswith(CLAIM_SUFFIX):
+            continue
+        path = os.path.join(new_dir, name)
+        try:
+            if time.time() - os.path.getmtime(path) > OUTBOX_CLAIM_TIMEOUT:
+                os.rename(path, path[:-len(CLAIM_SUFFIX)])
+                print(f"Released stale outbox claim {name}")
+        except FileNotFoundError:
+            continue
+
+
+def _prune_delivered(outbox_dir):
+    cur_dir = os.path.join(outbox_dir, CUR)
+    cutoff = time.time() - OUTBOX_SENT_TTL
+    for name in os.listdir(cur_dir):
+        path = os.path.join(cur_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+
+
+def _spooled_at(new_dir, key):
+    try:
+        return os.path.getmtime(os.path.join(new_dir, f'{key}.eml'))
+    except FileNotFoundError:
+        return 0
+
+
+def _lane_of(new_dir, key):
+    try:
+        return _read_sidecar(os.path.join(new_dir, f'{key}.json')).get('lane')
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _deliver_all(keys, send, outbox_dir):
+    return sum(1 for key in keys if deliver_entry(key, send, outbox_dir))
+
+
+def flush_outbox(send, outbox_dir=None):
+    """Try every pending entry whose backoff has passed, oldest first per lane; return (delivered, pending).
+
+    The lanes are flushed side by side, so the retries of one partner's entries
+    do not hold up the entries of the others.
+    """
+    outbox_dir = _outbox_dir(outbox_dir)
+    _release_stale_claims(outbox_dir)
+    _prune_delivered(outbox_dir)
+
+    new_dir = os.path.join(outbox_dir, NEW)
+    keys = sorted((name[:-len('.json')] for name in os.listdir(new_dir) if name.endswith('.json')),
+                  key=lambda key: _spooled_at(new_dir, key))
+    lanes = {}
+    for key in keys:
+        lanes.setdefault(_lane_of(new_dir, key), []).append(key)
+    futures = [get_delivery_lane(lane).submit(_deliver_all, lane_keys, send, outbox_dir)
+               for lane, lane_keys in lanes.items()]
+    delivered = sum(future.result() for future in futures)
+    return delivered, len(keys) - delivered
+
+
+class _Flusher(threading.Thread):
+    def __init__(self, send, outbox_dir, interval):
+        super().__init__(name='outbox-flusher', daemon=True)
+        self.send = send
+        self.outbox_dir = outbox_dir
+        self.interval = interval
+        self.wake = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                flush_outbox(self.send, self.outbox_dir)
+            except Exception as e:
+                print(f"Outbox flush failed: {e}")
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+
+def start_flusher(send, outbox_dir=None, interval=None):
+    """Start the background flusher for outbox_dir once per process."""
+    outbox_dir = os.path.abspath(_outbox_dir(outbox_dir))
+    with _flushers_lock:
+        if outbox_dir not in _flushers:
+            flusher = _Flusher(send, outbox_dir, interval or OUTBOX_FLUSH_INTERVAL)
+            _flushers[outbox_dir] = flusher
+            flusher.start()
+    return _flushers[outbox_dir]
+
+
+def wake_flusher(outbox_dir=None):
+    flusher = _flushers.get(os.path.abspath(outbox_dir or OUTBOX_DIR))
+    if flusher is not None:
+        flusher.wake.set()
+
+
+def smtp_sender(username, password):
+    """Return send(entry) that delivers the spooled bytes through the pooled, throttled SMTP path."""
+    def send(entry):
+        smtp_pool = get_smtp_pool(username, password)
+        data = entry.read_bytes()
+        get_delivery_scheduler().deliver(lambda: smtp_pool.sendmail(entry.sender, entry.recipients, data),
+                                         len(entry.recipients))
+    return send
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deliver the spooled ESFA form emails.')
+    parser.add_argument('--dir', default=OUTBOX_DIR, help='outbox directory')
+    parser.add_argument('--interval', type=int, default=OUTBOX_FLUSH_INTERVAL, help='seconds between flushes')
+    parser.add_argument('--once', action='store_true', help='flush once and exit')
+    args = parser.parse_args()
+
+    config = get_config()
+    send = smtp_sender(config.get('sender_email'), config.get('sender_password'))
+    while True:
+        delivered, pending = flush_outbox(send, args.dir)
+        print(f"Outbox flush: {delivered} delivered, {pending} pending")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
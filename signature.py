@@ -0,0 +1,140 @@
+# In-memory signature processing for the ESFA form.
+#
+# The drawable canvas hands back an RGBA array of the whole 400x150 pad.  The
+# ink is located with vectorised NumPy, the empty #ffffcc background around it
+# is cropped away and the result is downscaled once to fit the form's cell.
+# The PNG goes straight to the renderer as a BytesIO; nothing is written to disk.
+#
+# Signatures are embedded twice in every form and the form is mailed to several
+# recipients, so the PNG is binarised into a 1-bit palette image: black ink on a
+# transparent background, a fraction of the size of a full RGBA PNG.
+
+import io
+
+import numpy as np
+from PIL import Image as PILImage
+
+CANVAS_BACKGROUND = (255, 255, 204)  # '#ffffcc' set on st_canvas
+INK_COLOUR = (0, 0, 0)
+
+# Channel distance from the background below which a pixel counts as empty
+INK_TOLERANCE = 32
+# Pixels kept around the ink so stroke edges are not clipped
+INK_MARGIN = 4
+# Share of a downscaled pixel that must be covered by ink for it to be drawn
+INK_THRESHOLD = 96
+
+# Index 0 is the transparent background, index 1 the ink
+_PALETTE = [255, 255, 255, *INK_COLOUR]
+
+
+class SignatureStats:
+    """PNG sizes for the signatures of one submission.
+
+    bitmap_bytes is the size of the same images as uncompressed RGBA bitmaps, not
+    as the RGBA PNGs the form used to embed; it is an upper bound of the saving.
+    """
+
+    def __init__(self):
+        self.signatures = 0
+        self.bitmap_bytes = 0
+        self.compact_bytes = 0
+
+    @property
+    def saved_bytes(self):
+        return self.bitmap_bytes - self.compact_bytes
+
+
+def ink_mask(rgba, background=CANVAS_BACKGROUND, tolerance=INK_TOLERANCE):
+    """Boolean mask of the pixels that carry ink on a canvas RGBA array."""
+    rgb = rgba[..., :3].astype(np.int16)
+    differs = (np.abs(rgb - np.array(background, dtype=np.int16)) > tolerance).any(axis=-1)
+    return differs & (rgba[..., 3] > tolerance)
+
+
+def ink_bbox(mask, margin=INK_MARGIN):
+    """Return (top, bottom, left, right) around the ink in mask, or None for an empty canvas."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    height, width = mask.shape
+    return (max(rows[0] - margin, 0), min(rows[-1] + 1 + margin, height),
+            max(cols[0] - margin, 0), min(cols[-1] + 1 + margin, width))
+
+
+def _pad_to_aspect(array, aspect_ratio, fill):
+    # The renderer places every signature at a fixed width, so the crop keeps the
+    # cell's shape; a short or narrow signature would otherwise overflow the cell.
+    height, width = array.shape[:2]
+    if width / height > aspect_ratio:
+        target_height, target_width = int(round(width / aspect_ratio)), width
+    else:
+        target_height, target_width = height, int(round(height * aspect_ratio))
+    top = (target_height - height) // 2
+    left = (target_width - width) // 2
+    padded = np.empty((target_height, target_width) + array.shape[2:], dtype=array.dtype)
+    padded[...] = fill
+    padded[top:top + height, left:left + width] = array
+    return padded
+
+
+def crop_signature(image_data, max_width, max_height):
+    """Crop the canvas image_data to its ink, shaped like a max_width x max_height cell.
+
+    Returns (RGBA crop, ink mask crop) as uint8 arrays, or None when nothing was drawn.
+    """
+    rgba = np.asarray(image_data).astype(np.uint8, copy=False)
+    mask = ink_mask(rgba)
+    bbox = ink_bbox(mask)
+    if bbox is None:
+        return None
+    top, bottom, left, right = bbox
+    empty = rgba[~mask]
+    fill = empty[0] if len(empty) else (*CANVAS_BACKGROUND, 255)
+    aspect_ratio = max_width / max_height
+    return (_pad_to_aspect(rgba[top:bottom, left:right], aspect_ratio, fill),
+            _pad_to_aspect(mask[top:bottom, left:right].astype(np.uint8) * 255, aspect_ratio, 0))
+
+
+def _fit_size(width, height, max_width, max_height):
+    scale = min(max_width / width, max_height / height, 1)
+    return max(int(width * scale), 1), max(int(height * scale), 1)
+
+
+def _encode_png(image, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', **options)
+    buffer.seek(0)
+    return buffer
+
+
+def signature_png(image_data, max_width, max_height, stats=None):
+    """Render the canvas image_data as a cropped 1-bit PNG that fits max_width x max_height.
+
+    Returns a BytesIO ready for the renderer, or None when nothing was drawn.  When
+    stats is given, the PNG size is recorded next to the uncompressed RGBA bitmap size.
+    """
+    cropped = crop_signature(image_data, max_width, max_height)
+    if cropped is None:
+        return None
+    _, mask = cropped
+
+    # Single downscale of the ink coverage straight from the canvas pixels, then
+    # binarise: partly covered pixels along the strokes keep thin lines visible
+    coverage = PILImage.fromarray(mask, 'L')
+    size = _fit_size(coverage.width, coverage.height, max_width, max_height)
+    if size != coverage.size:
+        coverage = coverage.resize(size, PILImage.LANCZOS)
+    ink = np.asarray(coverage) >= INK_THRESHOLD
+
+    image = PILImage.fromarray(ink.astype(np.uint8), 'P')
+    image.putpalette(_PALETTE)
+    buffer = _encode_png(image, optimize=True, bits=1, transparency=0)
+
+    if stats is not None:
+        # Counted from the output size; no RGBA image is resized or encoded for it
+        stats.signatures += 1
+        stats.bitmap_bytes += size[0] * size[1] * 4
+        stats.compact_bytes += buffer.getbuffer().nbytes
+    return buffer
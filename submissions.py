@@ -0,0 +1,277 @@
+# Background submission jobs for the ESFA form.
+#
+# Submit in step 11 used to render the form and talk to the SMTP server on the
+# Streamlit script thread.  Now the script only persists the payload (values,
+# signatures and uploads) under SUBMISSION_DIR, enqueues a job and keeps its id
+# in the session.  A small worker pool renders and delivers the form while the
+# page polls the job status.  Jobs still on disk after a restart are resumed;
+# failed and orphaned job directories are deleted once FAILED_JOB_TTL or
+# ORPHANED_JOB_TTL old.
+
+import json
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from docx_template import convert_to_str
+
+SUBMISSION_DIR = os.environ.get('SUBMISSION_DIR', '.submissions')
+SUBMISSION_WORKERS = int(os.environ.get('SUBMISSION_WORKERS', '2'))
+# Finished jobs stay visible to the status view for this many seconds
+FINISHED_JOB_TTL = 3600
+# Failed submissions stay on disk for inspection this many seconds; they hold the
+# signatures, evidence and answers of the participant, so not for ever
+FAILED_JOB_TTL = int(os.environ.get('FAILED_JOB_TTL', str(7 * 24 * 3600)))
+# Job directories without a readable payload (a crash while persisting) are deleted after this
+ORPHANED_JOB_TTL = 3600
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+PAYLOAD_FILE = 'payload.json'
+STATUS_FILE = 'status.json'
+ATTACHMENTS_DIR = 'attachments'
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = None
+_resumed_dirs = set()
+
+
+class SubmissionJob:
+    """One persisted submission and its progress through the worker pool."""
+
+    def __init__(self, job_id, job_dir, payload):
+        self.job_id = job_id
+        self.job_dir = job_dir
+        self.payload = payload
+        self.status = QUEUED
+        self.message = 'Waiting in the queue'
+        self.error = None
+        self.document_data = None
+        self.created = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def document_name(self):
+        return self.payload['document_name']
+
+    def signature_images(self):
+        """Return {placeholder: PNG bytes} for the persisted signatures."""
+        images = {}
+        for key, filename in self.payload['signatures'].items():
+            with open(os.path.join(self.job_dir, filename), 'rb') as f:
+                images[key] = f.read()
+        return images
+
+    def attachments(self):
+        """Return the persisted uploads as (file name, bytes, document type) triples, in upload order."""
+        files = []
+        for name, filename, *document_type in self.payload['attachments']:
+            with open(os.path.join(self.job_dir, ATTACHMENTS_DIR, filename), 'rb') as f:
+                # Jobs persisted before uploads carried a document type have none
+                files.append((name, f.read(), document_type[0] if document_type else None))
+        return files
+
+    def set_status(self, status, message='', error=None):
+        self.status = status
+        self.message = message
+        self.error = error
+        if self.finished:
+            self.finished_at = time.time()
+        if os.path.isdir(self.job_dir):
+            _write_json(os.path.join(self.job_dir, STATUS_FILE),
+                        {'status': status, 'message': message, 'error': error})
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _link_or_copy(source, target):
+    # A hard link costs nothing and survives the source spool being deleted
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _get_executor():
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SUBMISSION_WORKERS, thread_name_prefix='submission')
+        return _executor
+
+
+def _prune_finished_jobs():
+    cutoff = time.time() - FINISHED_JOB_TTL
+    with _jobs_lock:
+        for job_id in [job_id for job_id, job in _jobs.items() if job.finished and job.finished_at < cutoff]:
+            del _jobs[job_id]
+
+
+def _run_job(process, job):
+    job.set_status(RUNNING, 'Processing the submission')
+    try:
+        process(job)
+    except Exception as e:
+        print(f"Submission {job.job_id} failed: {e}")
+        traceback.print_exc()
+        job.set_status(FAILED, 'The submission could not be delivered', str(e))
+        return
+    job.set_status(DONE, 'Submission finished')
+    # Delivered: the payload is no longer needed, the rendered form stays in memory for download
+    shutil.rmtree(job.job_dir, ignore_errors=True)
+    print(f"Submission {job.job_id} delivered")
+
+
+def _enqueue(process, job):
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+    _get_executor().submit(_run_job, process, job)
+
+
+def submit_job(process, payload, signature_images, attachments, submission_dir=None):
+    """Persist a submission, queue it for process(job) and return its job id.
+
+    payload holds the JSON-serialisable job fields; placeholder_values are stored
+    as the strings the renderer would write.  signature_images maps placeholder to
+    PNG bytes (None for a missing signature) and attachments is a list of
+    (file name, path, document type) triples; the document type may be None.
+    The files are linked (or copied) into the job directory, never read into memory.
+    """
+    _prune_finished_jobs()
+
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(submission_dir or SUBMISSION_DIR, job_id)
+    os.makedirs(os.path.join(job_dir, ATTACHMENTS_DIR))
+
+    payload = dict(payload)
+    payload['placeholder_values'] = {key: convert_to_str(value)
+                                     for key, value in payload['placeholder_values'].items()}
+    payload['signatures'] = {}
+    for key, data in signature_images.items():
+        if data is None:
+            continue
+        filename = f'signature_{key}.png'
+        with open(os.path.join(job_dir, filename), 'wb') as f:
+            f.write(data)
+        payload['signatures'][key] = filename
+
+    payload['attachments'] = []
+    for index, (name, path, document_type) in enumerate(attachments):
+        filename = f'{index:03d}'
+        _link_or_copy(path, os.path.join(job_dir, ATTACHMENTS_DIR, filename))
+        payload['attachments'].append((name, filename, document_type))
+
+    # payload.json is written last: a directory without it is an incomplete submission
+    _write_json(os.path.join(job_dir, PAYLOAD_FILE), payload)
+
+    job = SubmissionJob(job_id, job_dir, payload)
+    job.set_status(QUEUED, 'Waiting in the queue')
+    _enqueue(process, job)
+    print(f"Submission {job_id} queued ({len(attachments)} attachment(s))")
+    return job_id
+
+
+def get_job(job_id):
+    """Return the SubmissionJob for job_id, or None if it is unknown or expired."""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def _job_age(job_dir, now):
+    status_path = os.path.join(job_dir, STATUS_FILE)
+    # status.json is rewritten on every status change, so it dates the failure
+    return now - os.path.getmtime(status_path if os.path.isfile(status_path) else job_dir)
+
+
+def prune_job_dirs(submission_dir=None, failed_ttl=None, orphaned_ttl=None):
+    """Delete failed job directories older than failed_ttl and orphaned ones older than orphaned_ttl.
+
+    Returns how many directories were deleted.  Queued and running jobs are never touched.
+    """
+    submission_dir = submission_dir or SUBMISSION_DIR
+    failed_ttl = FAILED_JOB_TTL if failed_ttl is None else failed_ttl
+    orphaned_ttl = ORPHANED_JOB_TTL if orphaned_ttl is None else orphaned_ttl
+    if not os.path.isdir(submission_dir):
+        return 0
+
+    now = time.time()
+    pruned = 0
+    for job_id in os.listdir(submission_dir):
+        job_dir = os.path.join(submission_dir, job_id)
+        job = get_job(job_id)
+        if not os.path.isdir(job_dir) or (job is not None and not job.finished):
+            continue
+        try:
+            with open(os.path.join(job_dir, PAYLOAD_FILE), encoding='utf-8') as f:
+                json.load(f)
+            ttl = None
+            status_path = os.path.join(job_dir, STATUS_FILE)
+            if os.path.isfile(status_path):
+                with open(status_path, encoding='utf-8') as f:
+                    if json.load(f)['status'] == FAILED:
+                        ttl = failed_ttl
+        except (OSError, ValueError, KeyError):
+            ttl = orphaned_ttl
+        try:
+            if ttl is None or _job_age(job_dir, now) < ttl:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(job_dir, ignore_errors=True)
+        pruned += 1
+    if pruned:
+        print(f"Deleted {pruned} failed or orphaned submission(s) from {submission_dir}")
+    return pruned
+
+
+def resume_pending_jobs(process, submission_dir=None):
+    """Queue the persisted submissions left unfinished by a previous process, once per directory."""
+    submission_dir = os.path.abspath(submission_dir or SUBMISSION_DIR)
+    with _jobs_lock:
+        if submission_dir in _resumed_dirs:
+            return 0
+        _resumed_dirs.add(submission_dir)
+    if not os.path.isdir(submission_dir):
+        return 0
+
+    resumed = 0
+    for job_id in sorted(os.listdir(submission_dir)):
+        job_dir = os.path.join(submission_dir, job_id)
+        payload_path = os.path.join(job_dir, PAYLOAD_FILE)
+        if get_job(job_id) is not None or not os.path.isfile(payload_path):
+            continue
+        try:
+            with open(payload_path, encoding='utf-8') as f:
+                payload = json.load(f)
+            status_path = os.path.join(job_dir, STATUS_FILE)
+            if os.path.isfile(status_path):
+                with open(status_path, encoding='utf-8') as f:
+                    # Failed submissions are kept for inspection until prune_job_dirs() deletes them;
+                    # the participant was asked to resubmit
+                    if json.load(f)['status'] == FAILED:
+                        continue
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Skipping unreadable submission {job_id}: {e}")
+            continue
+        _enqueue(process, SubmissionJob(job_id, job_dir, payload))
+        resumed += 1
+    if resumed:
+        print(f"Resumed {resumed} pending submission(s) from {submission_dir}")
+    return resumed
@@ -0,0 +1,56 @@
+import io
+
+from PIL import Image
+
+import attachments
+from attachments import MESSAGE_OVERHEAD, encoded_size, pack_attachments, recompress_image
+
+
+def _image(mode='RGB', size=(2400, 1800), image_format='JPEG'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, 'white').save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def test_large_photo_is_fitted_to_the_page():
+    data, image_format = recompress_image(_image(), dpi=72)
+    assert image_format == 'JPEG'
+    with Image.open(io.BytesIO(data)) as image:
+        assert max(image.size) <= int(11.69 * 72)
+
+
+def test_other_files_are_left_alone():
+    assert recompress_image(b'%PDF-1.4 not an image') is None
+
+
+def test_truncated_image_keeps_the_original():
+    assert recompress_image(_image()[:600]) is None
+
+
+def test_image_that_cannot_be_converted_keeps_the_original(monkeypatch):
+    def convert(image, mode=None, *args, **kwargs):
+        raise ValueError(f'conversion from {image.mode} to {mode} not supported')
+
+    monkeypatch.setattr(attachments.PILImage.Image, 'convert', convert)
+    assert recompress_image(_image('CMYK')) is None
+
+
+def test_attachments_are_packed_into_messages_under_the_limit():
+    limit = 1024 * 1024
+    files = [(f'scan{index}.jpg', bytes(size)) for index, size in
+             enumerate((400 * 1024, 300 * 1024, 500 * 1024, 100 * 1024, 2 * 1024 * 1024))]
+    parts, oversized = pack_attachments(files, limit, first_part_bytes=200 * 1024)
+
+    assert [name for name, _ in oversized] == ['scan4.jpg']
+    # First fit decreasing: scan2 and the small scan3 fill the first message, each message in upload order
+    assert [[name for name, _ in part] for part in parts] == [['scan2.jpg', 'scan3.jpg'],
+                                                              ['scan0.jpg', 'scan1.jpg']]
+    assert 200 * 1024 + sum(encoded_size(len(data)) for _, data in parts[0]) <= limit
+    for part in parts[1:]:
+        assert MESSAGE_OVERHEAD + sum(encoded_size(len(data)) for _, data in part) <= limit
+
+
+def test_form_alone_can_fill_the_first_message():
+    parts, oversized = pack_attachments([('id.pdf', bytes(1000))], 64 * 1024, first_part_bytes=64 * 1024)
+    assert [[name for name, _ in part] for part in parts] == [[], ['id.pdf']]
+    assert oversized == []
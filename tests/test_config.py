@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+import config
+from config import DEFAULT_SUBJECT, get_config, load_config
+
+REPO_PARTNERS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'partners.json')
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty working directory with its own secrets file and partners.json."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / '.streamlit').mkdir()
+    monkeypatch.setattr(config, 'SECRETS_FILES', (str(tmp_path / '.streamlit' / 'secrets.toml'),))
+    monkeypatch.setattr(config, 'PARTNERS_FILE', str(tmp_path / 'partners.json'))
+    monkeypatch.setattr(config, '_config', None)
+    monkeypatch.setattr(config, 'CONFIG_CHECK_INTERVAL', 0)
+    for key in ('sender_email', 'email_catalyst', 'email_futures'):
+        monkeypatch.delenv(key, raising=False)
+    _write_partners(tmp_path, [{'name': 'Catalyst', 'recipients': ['email_catalyst']}])
+    return tmp_path
+
+
+def _write_partners(workdir, partners, **table):
+    (workdir / 'partners.json').write_text(json.dumps(dict(table, partners=partners)))
+
+
+def test_environment_wins_over_dotenv_over_secrets(workdir, monkeypatch):
+    (workdir / '.streamlit' / 'secrets.toml').write_text(
+        'sender_email = "secrets@example.com"\nemail_catalyst = "catalyst@example.com"\n[section]\nkey = 1\n')
+    (workdir / '.env').write_text('sender_email=dotenv@example.com\n')
+    assert load_config().get('sender_email') == 'dotenv@example.com'
+    monkeypatch.setenv('sender_email', 'env@example.com')
+    values = load_config()
+    assert values.get('sender_email') == 'env@example.com'
+    assert values.get('email_catalyst') == 'catalyst@example.com'
+    assert values.get('section') is None
+
+
+def test_partner_recipients_and_subjects(workdir, monkeypatch):
+    monkeypatch.setenv('sender_email', 'sender@example.com')
+    monkeypatch.setenv('email_catalyst', 'catalyst@example.com')
+    _write_partners(workdir, [
+        {'name': 'Catalyst', 'recipients': ['email_catalyst', 'team@example.com'], 'digest_minutes': 60},
+        {'name': 'Futures', 'recipients': ['email_futures'], 'subject': 'ESFA {referral} for {partner}'},
+    ], subject='Form: {partner} {family_name}')
+    loaded = load_config()
+    assert loaded.partner_names == ('Catalyst', 'Futures')
+    assert loaded.recipients('Catalyst') == ['sender@example.com', 'catalyst@example.com', 'team@example.com']
+    # An unset secret leaves the partner with the sender only
+    assert loaded.recipients('Futures') == ['sender@example.com']
+    assert loaded.partner('Catalyst').digest_minutes == 60
+    assert loaded.partner('Catalyst').subject(first_name='Ann', family_name='Lee', date='', referral='') \
+        == 'Form: Catalyst Lee'
+    assert loaded.partner('Futures').subject(first_name='', family_name='', date='', referral='R1') \
+        == 'ESFA R1 for Futures'
+    assert loaded.partner('Unknown').subject_template == DEFAULT_SUBJECT
+    assert loaded.recipients('Unknown') == ['sender@example.com']
+
+
+@pytest.mark.parametrize('entry', [
+    {'name': 'Catalyst', 'subject': 'ESFA {postcode}'},
+    {'name': 'Catalyst', 'digest_minutes': 0},
+    {'name': 'Catalyst', 'digest_minutes': '30'},
+])
+def test_invalid_partner_entries_are_rejected(workdir, entry):
+    _write_partners(workdir, [entry])
+    with pytest.raises(ValueError):
+        load_config()
+
+
+def test_changed_files_are_picked_up_and_a_bad_edit_is_ignored(workdir):
+    assert get_config().partner_names == ('Catalyst',)
+    _write_partners(workdir, [{'name': 'Catalyst'}, {'name': 'Futures'}])
+    assert get_config().partner_names == ('Catalyst', 'Futures')
+    (workdir / 'partners.json').write_text('{"partners": [')
+    assert get_config().partner_names == ('Catalyst', 'Futures')
+
+
+def test_repository_partner_table_loads(workdir, monkeypatch):
+    monkeypatch.setattr(config, 'PARTNERS_FILE', REPO_PARTNERS_FILE)
+    loaded = load_config()
+    with open(REPO_PARTNERS_FILE, encoding='utf-8') as f:
+        names = [entry['name'] for entry in json.load(f)['partners']]
+    assert loaded.partner_names == tuple(names)
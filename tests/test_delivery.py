@@ -0,0 +1,116 @@
+import smtplib
+
+import pytest
+
+import delivery
+from delivery import DeliveryScheduler, TokenBucket, is_transient_error
+
+
+class FakeClock:
+    """Stands in for time.monotonic and time.sleep, so nothing really waits."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(delivery.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(delivery.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_bucket_allows_a_burst_up_to_its_capacity(clock):
+    bucket = TokenBucket(60)
+    assert [bucket.reserve() for _ in range(60)] == [0.0] * 60
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.reserve(2) == pytest.approx(3.0)
+
+
+def test_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(60, capacity=2)
+    bucket.reserve(2)
+    clock.now += 1.5
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    clock.now += 60
+    # Never more than capacity, however long it sat idle
+    assert bucket.tokens == pytest.approx(-0.5)
+    assert bucket.reserve(2) == 0.0
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_bucket_caps_requests_at_its_capacity(clock):
+    bucket = TokenBucket(60, capacity=10)
+    assert bucket.reserve(25) == 0.0
+    assert bucket.reserve(25) == pytest.approx(10.0)
+
+
+def test_scheduler_spreads_a_burst_over_the_recipient_limit(clock):
+    scheduler = DeliveryScheduler(messages_per_minute=60, recipients_per_minute=6)
+    results = [scheduler.deliver(lambda: 'sent', recipient_count=3) for _ in range(3)]
+    assert results == ['sent'] * 3
+    # Two messages fill the recipient bucket; the third waits for 3 recipients at 1 per 10 s
+    assert clock.slept == [pytest.approx(30.0)]
+    metrics = scheduler.metrics()
+    assert (metrics['sent'], metrics['queue_depth'], metrics['max_wait']) == (3, 0, 30.0)
+
+
+def test_scheduler_retries_transient_failures(clock):
+    scheduler = DeliveryScheduler(attempts=3)
+    replies = [smtplib.SMTPResponseException(421, b'try again later'), 'sent']
+
+    def send():
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    assert scheduler.deliver(send) == 'sent'
+    assert clock.slept == [2]
+    assert (scheduler.stats.sent, scheduler.stats.retries) == (1, 1)
+
+
+def test_scheduler_does_not_retry_permanent_failures(clock):
+    scheduler = DeliveryScheduler(attempts=3)
+    calls = []
+
+    def send():
+        calls.append(1)
+        raise smtplib.SMTPResponseException(550, b'mailbox unavailable')
+
+    with pytest.raises(smtplib.SMTPResponseException):
+        scheduler.deliver(send)
+    assert len(calls) == 1
+    assert (scheduler.stats.failed, scheduler.stats.retries, scheduler.stats.queue_depth) == (1, 0, 0)
+
+
+def test_scheduler_gives_up_after_its_attempts(clock):
+    scheduler = DeliveryScheduler(attempts=3)
+
+    def send():
+        raise smtplib.SMTPServerDisconnected('gone')
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        scheduler.deliver(send)
+    assert clock.slept == [2, 4]
+    assert (scheduler.stats.failed, scheduler.stats.retries) == (1, 2)
+
+
+def test_transient_errors():
+    assert is_transient_error(smtplib.SMTPServerDisconnected('gone'))
+    assert is_transient_error(ConnectionResetError())
+    assert is_transient_error(smtplib.SMTPRecipientsRefused({'a@example.com': (450, b'busy')}))
+    assert not is_transient_error(smtplib.SMTPRecipientsRefused(
+        {'a@example.com': (450, b'busy'), 'b@example.com': (550, b'unknown')}))
+    assert not is_transient_error(smtplib.SMTPResponseException(552, b'too big'))
+    assert not is_transient_error(ValueError())
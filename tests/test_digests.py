@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+import time
+import zipfile
+
+import pytest
+
+import config
+import digests
+from digests import build_digest, flush_digests, pending_digests, spool_submission
+
+
+@pytest.fixture
+def partners(tmp_path, monkeypatch):
+    """A routing table with one partner in digest mode and one without."""
+    path = tmp_path / 'partners.json'
+    path.write_text(json.dumps({'partners': [
+        {'name': 'Catalyst', 'recipients': ['catalyst@example.com'], 'digest_minutes': 30},
+        {'name': 'Futures', 'recipients': ['futures@example.com']},
+    ]}))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, 'PARTNERS_FILE', str(path))
+    monkeypatch.setattr(config, '_config', None)
+
+
+@pytest.fixture
+def digest_dir(tmp_path):
+    return str(tmp_path / 'digests')
+
+
+def _spool(digest_dir, partner, job_id, learner, files=(('passport.pdf', b'P' * 100),)):
+    row = {'reference': f'REF-{job_id}', 'learner': learner, 'subject': f'ESFA: {partner} {learner}'}
+    spool_submission(partner, job_id, row, 'form.docx', b'D' * 100, files, digest_dir)
+
+
+def test_spooled_submissions_are_pending_oldest_first(digest_dir):
+    _spool(digest_dir, 'Catalyst', 'job-1', 'Ann Lee')
+    _spool(digest_dir, 'Catalyst', 'job-2', 'Bo Chan', files=[('id.pdf', b'1'), ('id.pdf', b'2')])
+    pending = pending_digests(digest_dir)
+    assert list(pending) == ['Catalyst']
+    assert [entry['job_id'] for entry in pending['Catalyst']] == ['job-1', 'job-2']
+    assert pending['Catalyst'][1]['files'] == ['form.docx', 'id.pdf', 'id (2).pdf']
+
+
+def test_digest_is_one_zip_with_a_folder_per_submission(digest_dir):
+    _spool(digest_dir, 'Catalyst', 'job-1', 'Ann Lee')
+    _spool(digest_dir, 'Catalyst', 'job-2', 'Bo Chan')
+    zips, body = build_digest('Catalyst', pending_digests(digest_dir)['Catalyst'])
+    assert len(zips) == 1
+    name, data = zips[0]
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert sorted(archive.namelist()) == ['01 Ann Lee/form.docx', '01 Ann Lee/passport.pdf',
+                                              '02 Bo Chan/form.docx', '02 Bo Chan/passport.pdf',
+                                              'summary.csv']
+        assert archive.read('02 Bo Chan/passport.pdf') == b'P' * 100
+        summary = list(csv.reader(io.StringIO(archive.read('summary.csv').decode('utf-8'))))
+    assert [row[1:3] for row in summary[1:]] == [['Ann Lee', 'REF-job-1'], ['Bo Chan', 'REF-job-2']]
+    assert 'REF-job-1' in body and name in body
+
+
+def test_digest_is_split_between_submissions_over_the_budget(digest_dir):
+    for number in range(1, 4):
+        _spool(digest_dir, 'Catalyst', f'job-{number}', f'Learner {number}')
+    # Each submission carries 200 bytes: two fit in a zip, the third starts a new one
+    zips, body = build_digest('Catalyst', pending_digests(digest_dir)['Catalyst'], budget=450)
+    assert [name[-12:] for name, _ in zips] == ['(1 of 2).zip', '(2 of 2).zip']
+    folders = []
+    for _, data in zips:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            folders.append(sorted({path.split('/')[0] for path in archive.namelist() if '/' in path}))
+    assert folders == [['01 Learner 1', '02 Learner 2'], ['03 Learner 3']]
+    assert body.count(zips[1][0]) == 1
+
+
+def test_digest_waits_for_digest_minutes(partners, digest_dir, monkeypatch):
+    sent = []
+    _spool(digest_dir, 'Catalyst', 'job-1', 'Ann Lee')
+    assert flush_digests(lambda *args: sent.append(args), digest_dir) == 0
+    assert sent == []
+
+    later = time.time() + 31 * 60
+    monkeypatch.setattr(digests.time, 'time', lambda: later)
+    assert flush_digests(lambda *args: sent.append(args), digest_dir) == 1
+    (partner, key, subject, body, files), = sent
+    assert (partner, len(files)) == ('Catalyst', 1)
+    assert key == digests._digest_key([{'job_id': 'job-1'}])
+    assert subject.startswith('ESFA digest: Catalyst') and subject.endswith('(1 submission(s))')
+    assert pending_digests(digest_dir) == {}
+
+
+def test_partner_without_digest_mode_is_flushed_straight_away(partners, digest_dir):
+    sent = []
+    _spool(digest_dir, 'Futures', 'job-1', 'Ann Lee')
+    _spool(digest_dir, 'Catalyst', 'job-2', 'Bo Chan')
+    assert flush_digests(lambda *args: sent.append(args), digest_dir) == 1
+    assert [args[0] for args in sent] == ['Futures']
+    assert list(pending_digests(digest_dir)) == ['Catalyst']
+
+
+def test_failed_digest_is_kept_for_the_next_round(partners, digest_dir):
+    def send(*args):
+        raise OSError('outbox unavailable')
+
+    _spool(digest_dir, 'Catalyst', 'job-1', 'Ann Lee')
+    assert flush_digests(send, digest_dir, force=True) == 0
+    assert [entry['job_id'] for entry in pending_digests(digest_dir)['Catalyst']] == ['job-1']
@@ -0,0 +1,79 @@
+import io
+import os
+import zipfile
+
+import pytest
+from docx import Document
+from docx.oxml.ns import qn
+from PIL import Image
+
+import docx_template
+from docx_stream import render_document_stream
+from docx_template import SIGNATURE_PLACEHOLDERS, get_compiled_template, render_document, tokenize_placeholders
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ph_esfa_v5.docx')
+
+
+@pytest.fixture(autouse=True)
+def template_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(docx_template, 'TEMPLATE_CACHE_DIR', str(tmp_path / 'template_cache'))
+
+
+def _png(colour):
+    buffer = io.BytesIO()
+    Image.new('RGB', (200, 47), colour).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _values():
+    compiled = get_compiled_template(TEMPLATE)
+    # 'V' keeps the value itself from reading as a placeholder token
+    return {key: f'V{key}' for key in compiled.placeholders - set(SIGNATURE_PLACEHOLDERS)}
+
+
+def _signatures():
+    return {'p230': io.BytesIO(_png('black')), 'p234': io.BytesIO(_png('navy'))}
+
+
+def _added_pictures(data):
+    with open(TEMPLATE, 'rb') as f:
+        template_pictures = len(Document(f).inline_shapes)
+    return len(Document(io.BytesIO(data)).inline_shapes) - template_pictures
+
+
+def _paragraph_texts(data):
+    body = Document(io.BytesIO(data)).element.body
+    return [''.join(t.text or '' for t in p.iter(qn('w:t'))) for p in body.iter(qn('w:p'))]
+
+
+def test_rendered_form_is_a_valid_filled_docx():
+    values = _values()
+    data = render_document_stream(TEMPLATE, values, _signatures()).getvalue()
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+    # Each signature appears in two slots
+    assert _added_pictures(data) == 2 * len(SIGNATURE_PLACEHOLDERS)
+
+    text = '\n'.join(_paragraph_texts(data))
+    left = set(tokenize_placeholders(text)[1::2]) & get_compiled_template(TEMPLATE).placeholders
+    assert left == set()
+    assert [key for key, value in values.items() if value not in text] == []
+
+
+def test_rendered_form_matches_the_python_docx_renderer():
+    values = _values()
+    streamed = render_document_stream(TEMPLATE, values, _signatures()).getvalue()
+    reference = render_document(TEMPLATE, values, _signatures()).getvalue()
+    assert _paragraph_texts(streamed) == _paragraph_texts(reference)
+    assert _added_pictures(streamed) == _added_pictures(reference)
+
+
+def test_missing_signature_fails_the_render():
+    with pytest.raises(ValueError, match='p234'):
+        render_document_stream(TEMPLATE, _values(), {'p230': _png('black'), 'p234': None})
+
+
+def test_unreadable_signature_fails_the_render():
+    with pytest.raises(ValueError, match='p230'):
+        render_document_stream(TEMPLATE, _values(), {'p230': b'not a png', 'p234': _png('navy')})
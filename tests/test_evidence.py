@@ -0,0 +1,21 @@
+import io
+
+from PIL import Image
+
+from evidence import bundle_evidence
+
+
+def _jpeg():
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), 'white').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def test_bundle_does_not_take_a_loose_attachment_name():
+    files = [('scan.jpg', _jpeg(), 'Passport'),
+             ('Passport.pdf', b'%PDF-1.4 uploaded as is', None)]
+    attachments, bundles = bundle_evidence(files)
+    names = [name for name, _ in attachments]
+    assert names == ['Passport (2).pdf', 'Passport.pdf']
+    assert bundles == {'Passport (2).pdf': ['scan.jpg']}
+    assert dict(attachments)['Passport.pdf'] == b'%PDF-1.4 uploaded as is'
@@ -0,0 +1,45 @@
+from form_state import LLDD_FIELDS, FormState, LearningDifficulties
+
+
+def test_no_condition_marked():
+    assert not LearningDifficulties().any_condition()
+
+
+def test_any_lldd_type_counts_as_a_condition():
+    for name in LLDD_FIELDS:
+        lldd = LearningDifficulties()
+        setattr(lldd, name, 'X')
+        assert lldd.any_condition(), name
+
+
+def test_prefer_not_to_say_counts_as_a_condition():
+    # Disability = Yes with only "Prefer not to say (98)" ticked must pass step 5
+    assert LearningDifficulties(prefer_not_to_say='X').any_condition()
+
+
+def test_reset_restores_the_defaults():
+    form = FormState()
+    form.lldd.prefer_not_to_say = 'X'
+    setattr(form.lldd, LLDD_FIELDS[0], 'X')
+    form.lldd.reset()
+    assert not form.lldd.any_condition()
+    assert form.to_placeholders()['p176'] == ''
+
+
+def test_filled_flags_follow_the_marks():
+    form = FormState()
+    placeholders = form.to_placeholders()
+    assert (placeholders['p300'], placeholders['p301'], placeholders['p302']) == ('', '', '')
+    form.household.none_of_the_above = 'X'
+    # An unticked proof checkbox is written as '-'
+    form.proof_of_age.full_passport_eu = '-'
+    form.proof_of_age.e02_other_evidence_text = 'Travel card'
+    form.proof_of_address.e03_pension_statement = 'X'
+    placeholders = form.to_placeholders()
+    assert (placeholders['p300'], placeholders['p301'], placeholders['p302']) == ('filled', 'Filled', 'Filled')
+
+
+def test_learner_name_is_made_of_the_names():
+    form = FormState()
+    form.personal.first_name, form.personal.middle_name, form.personal.family_name = 'Ann', 'May', 'Lee'
+    assert form.to_placeholders()['p241'] == 'Ann May Lee'
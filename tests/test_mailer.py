@@ -0,0 +1,154 @@
+import socket
+import socketserver
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+from mailer import SMTP_MAX_MESSAGE_SIZE, SMTPConnectionPool
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough ESMTP for smtplib: no STARTTLS or AUTH, every message accepted."""
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.sessions.append(self.request)
+        self._reply('220 localhost ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii').strip().upper()
+            if command.startswith('EHLO'):
+                if server.size is None:
+                    self._reply('250 localhost')
+                else:
+                    self._reply('250-localhost')
+                    self._reply(f'250 SIZE {server.size}')
+            elif command == 'DATA':
+                self._reply('354 end with <CRLF>.<CRLF>')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                server.messages.append(data)
+                self._reply('250 queued')
+            elif command == 'QUIT':
+                server.quits += 1
+                self._reply('221 bye')
+                return
+            else:
+                # MAIL, RCPT, NOOP and RSET
+                self._reply('250 OK')
+
+    def _reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode('ascii'))
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self, size=None):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.size = size
+        self.sessions = []
+        self.messages = []
+        self.quits = 0
+        self.lock = threading.Lock()
+
+    def drop_sessions(self):
+        """Cut every open session, as a server does with idle clients."""
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            session.shutdown(socket.SHUT_RDWR)
+
+
+@pytest.fixture
+def smtp_server():
+    def start(size=None):
+        server = _SMTPServer(size)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _pool(server, **options):
+    return SMTPConnectionPool(*server.server_address, starttls=False, timeout=5, **options)
+
+
+def _message(number):
+    msg = EmailMessage()
+    msg['From'] = 'sender@example.com'
+    msg['To'] = 'partner@example.com'
+    msg['Subject'] = f'Submission {number}'
+    msg.set_content('Form attached.')
+    return msg
+
+
+def test_sessions_are_reused(smtp_server):
+    server = smtp_server()
+    pool = _pool(server)
+    for number in range(3):
+        pool.send_message(_message(number))
+    pool.close()
+    assert len(server.messages) == 3
+    assert (pool.stats.connects, pool.stats.reuses, pool.stats.messages) == (1, 2, 3)
+
+
+def test_dropped_session_is_reconnected(smtp_server):
+    server = smtp_server()
+    pool = _pool(server)
+    pool.send_message(_message(1))
+    server.drop_sessions()
+    pool.send_message(_message(2))
+    pool.close()
+    assert len(server.messages) == 2
+    assert (pool.stats.connects, pool.stats.reconnects, pool.stats.messages) == (2, 1, 2)
+
+
+def test_idle_session_is_probed_before_reuse(smtp_server):
+    server = smtp_server()
+    pool = _pool(server, probe_after=0)
+    pool.send_message(_message(1))
+    server.drop_sessions()
+    pool.send_message(_message(2))
+    pool.close()
+    # The probe finds the dropped session, so the send itself never fails
+    assert (pool.stats.probes, pool.stats.connects, pool.stats.reconnects) == (1, 2, 0)
+
+
+def test_message_size_limit(smtp_server):
+    assert _pool(smtp_server(size=10 * 1024 * 1024)).message_size_limit() == 10 * 1024 * 1024
+    assert _pool(smtp_server(size=150 * 1024 * 1024)).message_size_limit() == SMTP_MAX_MESSAGE_SIZE
+    assert _pool(smtp_server()).message_size_limit() == SMTP_MAX_MESSAGE_SIZE
+
+
+def test_session_is_closed_when_the_block_raises(smtp_server):
+    server = smtp_server()
+    pool = _pool(server, size=1)
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError('the message could not be built')
+    # Ended with QUIT rather than left open until garbage collection
+    assert (pool._idle, server.quits) == ([], 1)
+    # The only slot was given back: a send still goes through, on a new session
+    pool.send_message(_message(1))
+    pool.close()
+    assert len(server.messages) == 1
+    assert (pool.stats.connects, pool.stats.reuses) == (2, 0)
+
+
+def test_message_size_limit_without_connecting(smtp_server):
+    server = smtp_server(size=10 * 1024 * 1024)
+    pool = _pool(server)
+    assert pool.message_size_limit(connect=False) == SMTP_MAX_MESSAGE_SIZE
+    assert pool.stats.connects == 0
+    pool.send_message(_message(1))
+    pool.close()
+    assert pool.message_size_limit(connect=False) == 10 * 1024 * 1024
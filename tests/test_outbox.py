@@ -0,0 +1,100 @@
+import os
+import shutil
+import time
+from email.message import EmailMessage
+
+import pytest
+
+import outbox
+from outbox import CLAIM_SUFFIX, CUR, FAILED, NEW, deliver_entry, find_entry, flush_outbox, spool_message
+
+
+@pytest.fixture
+def outbox_dir(tmp_path):
+    return str(tmp_path / 'outbox')
+
+
+def _message(subject='ESFA: Catalyst Ann Lee'):
+    msg = EmailMessage()
+    msg['From'] = 'sender@example.com'
+    msg['To'] = 'partner@example.com'
+    msg['Subject'] = subject
+    msg.set_content('Form attached.')
+    return msg
+
+
+def _spool(outbox_dir, key='job-1'):
+    return spool_message(_message(), key, 'sender@example.com', ['partner@example.com'], outbox_dir)
+
+
+def _names(outbox_dir, state):
+    return sorted(os.listdir(os.path.join(outbox_dir, state)))
+
+
+def test_spooled_message_is_sent_once(outbox_dir):
+    sent = []
+    entry = _spool(outbox_dir)
+    assert entry.read_bytes().startswith(b'From: sender@example.com')
+    # The same key is not spooled again, whatever its state
+    assert _spool(outbox_dir).key == 'job-1'
+    assert flush_outbox(lambda entry: sent.append(entry.read_bytes()), outbox_dir) == (1, 0)
+    assert _spool(outbox_dir).state == CUR
+    assert flush_outbox(lambda entry: sent.append(entry.read_bytes()), outbox_dir) == (0, 0)
+    assert len(sent) == 1 and b'Message-ID: <job-1@example.com>' in sent[0]
+    assert _names(outbox_dir, NEW) == [] and _names(outbox_dir, CUR) == ['job-1.eml', 'job-1.json']
+
+
+def test_claimed_entry_is_not_sent_by_another_flusher(outbox_dir):
+    _spool(outbox_dir)
+    sent = []
+
+    def send(entry):
+        # A second flusher racing this one finds the sidecar renamed away
+        assert deliver_entry(entry.key, lambda entry: sent.append('second'), outbox_dir) is False
+        assert _names(outbox_dir, NEW) == ['job-1.eml', f'job-1.json{CLAIM_SUFFIX}']
+        sent.append('first')
+
+    assert deliver_entry('job-1', send, outbox_dir) is True
+    assert sent == ['first']
+
+
+def test_claim_of_a_crashed_flusher_is_released(outbox_dir):
+    _spool(outbox_dir)
+    new_dir = os.path.join(outbox_dir, NEW)
+    # A flusher that died mid-send leaves its claim behind
+    os.rename(os.path.join(new_dir, 'job-1.json'), os.path.join(new_dir, f'job-1.json{CLAIM_SUFFIX}'))
+    sent = []
+    assert flush_outbox(sent.append, outbox_dir) == (0, 0)
+
+    stale = time.time() - outbox.OUTBOX_CLAIM_TIMEOUT - 1
+    os.utime(os.path.join(new_dir, f'job-1.json{CLAIM_SUFFIX}'), (stale, stale))
+    assert flush_outbox(sent.append, outbox_dir) == (1, 0)
+    assert [entry.key for entry in sent] == ['job-1']
+
+
+def test_half_moved_entry_is_not_sent_again(outbox_dir):
+    _spool(outbox_dir)
+    assert deliver_entry('job-1', lambda entry: None, outbox_dir)
+    # A crash between writing the sidecar to cur/ and removing the pending files
+    new_dir = os.path.join(outbox_dir, NEW)
+    shutil.copyfile(os.path.join(outbox_dir, CUR, 'job-1.json'), os.path.join(new_dir, 'job-1.json'))
+    assert deliver_entry('job-1', lambda entry: pytest.fail('sent twice'), outbox_dir) is True
+    assert _names(outbox_dir, NEW) == []
+
+
+def test_failing_entry_backs_off_then_fails(outbox_dir, monkeypatch):
+    monkeypatch.setattr(outbox, 'OUTBOX_MAX_ATTEMPTS', 2)
+
+    def send(entry):
+        raise OSError('connection refused')
+
+    _spool(outbox_dir)
+    assert deliver_entry('job-1', send, outbox_dir) is False
+    meta = find_entry('job-1', outbox_dir).meta
+    assert (meta['attempts'], meta['last_error']) == (1, 'OSError: connection refused')
+    assert meta['next_attempt'] > time.time() + outbox.OUTBOX_RETRY_BASE - 5
+    # Still backing off
+    assert flush_outbox(send, outbox_dir) == (0, 1)
+    assert deliver_entry('job-1', send, outbox_dir, force=True) is False
+    assert find_entry('job-1', outbox_dir).state == FAILED
+    assert _names(outbox_dir, NEW) == []
@@ -0,0 +1,52 @@
+import json
+import os
+import time
+
+import submissions
+from submissions import FAILED, QUEUED, prune_job_dirs, submit_job
+
+
+def _job_dir(root, job_id, status=None, payload=True, age=0):
+    job_dir = root / job_id
+    job_dir.mkdir()
+    if payload:
+        (job_dir / submissions.PAYLOAD_FILE).write_text(json.dumps({'document_name': 'form.docx'}))
+    paths = [job_dir]
+    if status is not None:
+        (job_dir / submissions.STATUS_FILE).write_text(json.dumps({'status': status}))
+        paths.append(job_dir / submissions.STATUS_FILE)
+    then = time.time() - age
+    for path in paths:
+        os.utime(path, (then, then))
+    return job_dir
+
+
+def test_old_failed_and_orphaned_jobs_are_pruned(tmp_path):
+    day = 24 * 3600
+    _job_dir(tmp_path, 'failed-old', FAILED, age=8 * day)
+    _job_dir(tmp_path, 'failed-recent', FAILED, age=day)
+    _job_dir(tmp_path, 'queued-old', QUEUED, age=30 * day)
+    _job_dir(tmp_path, 'orphan-old', payload=False, age=2 * 3600)
+    _job_dir(tmp_path, 'orphan-recent', payload=False, age=60)
+    (_job_dir(tmp_path, 'unreadable-old', age=2 * 3600) / submissions.PAYLOAD_FILE).write_text('{')
+    os.utime(tmp_path / 'unreadable-old', (time.time() - 2 * 3600,) * 2)
+
+    assert prune_job_dirs(str(tmp_path), failed_ttl=7 * day, orphaned_ttl=3600) == 3
+    assert sorted(os.listdir(tmp_path)) == ['failed-recent', 'orphan-recent', 'queued-old']
+
+
+def test_job_that_failed_in_this_process_is_pruned(tmp_path):
+    def process(job):
+        raise RuntimeError('The form could not be generated')
+
+    job_id = submit_job(process, {'document_name': 'form.docx', 'placeholder_values': {}}, {}, [],
+                        str(tmp_path))
+    status_path = tmp_path / job_id / submissions.STATUS_FILE
+    for _ in range(100):
+        if json.loads(status_path.read_text())['status'] == FAILED:
+            break
+        time.sleep(0.01)
+    assert submissions.get_job(job_id).status == FAILED
+    assert prune_job_dirs(str(tmp_path), failed_ttl=7 * 24 * 3600) == 0
+    assert prune_job_dirs(str(tmp_path), failed_ttl=0) == 1
+    assert os.listdir(tmp_path) == []
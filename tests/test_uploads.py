@@ -0,0 +1,53 @@
+import io
+import os
+import shutil
+
+from uploads import UploadRegistry
+
+
+class FakeUpload(io.BytesIO):
+    """What st.file_uploader returns: file contents with a name, size and file id."""
+
+    def __init__(self, data, name, file_id):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+        self.file_id = file_id
+
+
+def _registry(tmp_path):
+    registry = UploadRegistry(str(tmp_path))
+    os.makedirs(registry.spool_dir)
+    return registry
+
+
+def test_only_uploads_with_a_missing_file_are_lost(tmp_path):
+    registry = _registry(tmp_path)
+    passport = registry.set('passport', FakeUpload(b'passport', 'passport.jpg', 'f1'), 'Passport')
+    registry.set('bill', FakeUpload(b'bill', 'bill.jpg', 'f2'), 'Bill')
+    os.remove(passport.path)
+
+    assert registry.check() == {'passport': ('passport.jpg', 'Passport')}
+    assert [upload.name for upload in registry] == ['bill.jpg']
+
+
+def test_uploading_again_clears_the_lost_upload(tmp_path):
+    registry = _registry(tmp_path)
+    passport = registry.set('passport', FakeUpload(b'passport', 'passport.jpg', 'f1'), 'Passport')
+    os.remove(passport.path)
+    registry.check()
+
+    registry.set('passport', FakeUpload(b'passport', 'passport.jpg', 'f3'), 'Passport')
+    assert registry.check() == {}
+    assert [name for name, _, _ in registry.attachments()] == ['passport.jpg']
+
+
+def test_reaped_spool_keeps_the_uploads_as_lost(tmp_path):
+    registry = _registry(tmp_path)
+    registry.set('passport', FakeUpload(b'passport', 'passport.jpg', 'f1'), 'Passport')
+    registry.set('bill', FakeUpload(b'bill', 'bill.jpg', 'f2'), 'Bill')
+    shutil.rmtree(registry.spool_dir)
+
+    assert registry.check() == {'passport': ('passport.jpg', 'Passport'), 'bill': ('bill.jpg', 'Bill')}
+    assert len(registry) == 0
+    assert os.path.isdir(registry.spool_dir)
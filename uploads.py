@@ -0,0 +1,257 @@
+# Uploaded evidence of one ESFA form session.
+#
+# Uploads used to be deduplicated by (file name, size): the same passport photo
+# uploaded under two checkboxes with different names was attached twice, while
+# two different photos both called image.jpg of equal size collided.  The
+# registry keys every upload by a BLAKE2b digest of its contents, read in
+# chunks, stores each distinct file once and records every label it was
+# uploaded under.
+#
+# Entries are also keyed by the uploader widget that holds them.  The uploaders
+# report their file on every rerun; re-selecting replaces the widget's entry and
+# clearing it removes it, so the registry only holds the files currently
+# selected instead of growing with every rerun.
+#
+# The contents are not kept in session state: each distinct file is copied in
+# chunks to a spool directory of its own session under UPLOAD_SPOOL_DIR while it
+# is hashed, and the session only keeps the path.  Spools of sessions that have
+# been idle for UPLOAD_SPOOL_TTL (abandoned forms) are deleted by a reaper thread.
+# If a form comes back after its spool was reaped, the uploads whose files are
+# gone are listed as lost, so they can be uploaded again before submitting.
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+
+UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR', '.uploads')
+# A session spool untouched for this many seconds belongs to an abandoned form
+UPLOAD_SPOOL_TTL = int(os.environ.get('UPLOAD_SPOOL_TTL', str(6 * 3600)))
+UPLOAD_REAP_INTERVAL = 600
+# A live session marks its spool as used at most this often
+UPLOAD_TOUCH_INTERVAL = 60
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_reapers = {}
+_reapers_lock = threading.Lock()
+
+
+def spool_file(file, directory, chunk_size=HASH_CHUNK_SIZE):
+    """Copy a file-like object into directory, named by its content digest; return (digest, path).
+
+    The contents are hashed while they are written, in one pass; a file that is
+    already spooled is not written twice.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    tmp_path = os.path.join(directory, f'.{uuid.uuid4().hex}.tmp')
+    file.seek(0)
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: file.read(chunk_size), b''):
+                digest.update(chunk)
+                f.write(chunk)
+        path = os.path.join(directory, digest.hexdigest())
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        file.seek(0)
+    return digest.hexdigest(), path
+
+
+class StoredUpload:
+    """One distinct uploaded file, spooled at path, and the uploaders (widget key -> label) holding it."""
+
+    def __init__(self, digest, name, size, path):
+        self.digest = digest
+        self.name = name
+        self.size = size
+        self.path = path
+        self.widgets = {}
+
+    @property
+    def labels(self):
+        return list(dict.fromkeys(label for label in self.widgets.values() if label))
+
+    @property
+    def document_type(self):
+        """The label the file was first uploaded under; evidence is bundled by it."""
+        return self.labels[0] if self.labels else None
+
+
+class UploadRegistry:
+    """The distinct uploads of one session, keyed by content digest, in upload order."""
+
+    def __init__(self, spool_dir=None):
+        self.spool_dir = os.path.join(spool_dir or UPLOAD_SPOOL_DIR, uuid.uuid4().hex)
+        self._uploads = {}   # digest -> StoredUpload
+        self._widgets = {}   # widget key -> (Streamlit file id, digest, label)
+        self.lost = {}       # widget key -> (file name, label) of uploads whose spool file is gone
+        self._touched = 0.0
+
+    def _touch(self):
+        """Mark the spool as in use; after the reaper deleted it, move the uploads it held to lost."""
+        now = time.time()
+        if now - self._touched < UPLOAD_TOUCH_INTERVAL:
+            return
+        self._touched = now
+        if os.path.isdir(self.spool_dir):
+            os.utime(self.spool_dir)
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._drop_missing()
+
+    def _drop_missing(self):
+        for digest, upload in list(self._uploads.items()):
+            if os.path.exists(upload.path):
+                continue
+            # An uploader still showing the file spools it again on its next rerun
+            for widget_key, label in upload.widgets.items():
+                self.lost[widget_key] = (upload.name, label)
+                del self._widgets[widget_key]
+            del self._uploads[digest]
+
+    def check(self):
+        """Return the lost uploads, {widget key: (file name, label)}, checking every spool file now."""
+        self._touched = 0.0
+        self._touch()
+        self._drop_missing()
+        return dict(self.lost)
+
+    def set(self, widget_key, uploaded_file, label=None):
+        """Make uploaded_file, under label, the file of widget_key and return its StoredUpload.
+
+        Whatever the widget held before is replaced; None removes it.  Known
+        contents are stored once.
+        """
+        self._touch()
+        if uploaded_file is None:
+            self.remove(widget_key)
+            return None
+        self.lost.pop(widget_key, None)
+        file_id = getattr(uploaded_file, 'file_id', None)
+        entry = self._widgets.get(widget_key)
+        if entry is not None and file_id and entry[0] == file_id:
+            # The usual rerun: the widget still holds the same, already spooled file
+            upload = self._uploads[entry[1]]
+            if entry[2] != label:
+                upload.widgets[widget_key] = label
+                self._widgets[widget_key] = (file_id, entry[1], label)
+            return upload
+        # Released first, so a re-upload of the same contents is not deleted right after spooling
+        self.remove(widget_key)
+        digest, path = spool_file(uploaded_file, self.spool_dir)
+        upload = self._uploads.get(digest)
+        if upload is None:
+            upload = StoredUpload(digest, uploaded_file.name, uploaded_file.size, path)
+            self._uploads[digest] = upload
+        upload.widgets[widget_key] = label
+        self._widgets[widget_key] = (file_id, digest, label)
+        return upload
+
+    def remove(self, *widget_keys):
+        """Drop the files of widget_keys; a file is deleted once no widget holds it."""
+        for widget_key in widget_keys:
+            self.lost.pop(widget_key, None)
+            entry = self._widgets.pop(widget_key, None)
+            if entry is None:
+                continue
+            upload = self._uploads[entry[1]]
+            del upload.widgets[widget_key]
+            if not upload.widgets:
+                del self._uploads[entry[1]]
+                try:
+                    os.remove(upload.path)
+                except FileNotFoundError:
+                    pass
+
+    def discard(self):
+        """Forget every upload and delete the session spool, e.g. once the form has been submitted."""
+        self._uploads.clear()
+        self._widgets.clear()
+        self.lost.clear()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def __iter__(self):
+        return iter(list(self._uploads.values()))
+
+    def __len__(self):
+        return len(self._uploads)
+
+    def summary_html(self):
+        """One line per distinct file with the labels it was uploaded under."""
+        return "<br>".join(f"- {upload.name} ({', '.join(upload.labels)})" if upload.labels else f"- {upload.name}"
+                           for upload in self)
+
+    def attachments(self):
+        """Return the distinct uploads as (file name, spool path, document type) triples.
+
+        Different files that share a name get a numbered name, so every
+        attachment of the email can be told apart.
+        """
+        files = []
+        taken = set()
+        for upload in self:
+            name = upload.name
+            root, ext = os.path.splitext(name)
+            counter = 2
+            while name in taken:
+                name = f'{root} ({counter}){ext}'
+                counter += 1
+            taken.add(name)
+            files.append((name, upload.path, upload.document_type))
+        return files
+
+
+def reap_spools(spool_dir=None, ttl=None):
+    """Delete the session spools under spool_dir unused for ttl seconds; return how many were deleted."""
+    spool_dir = spool_dir or UPLOAD_SPOOL_DIR
+    cutoff = time.time() - (UPLOAD_SPOOL_TTL if ttl is None else ttl)
+    if not os.path.isdir(spool_dir):
+        return 0
+    reaped = 0
+    for name in os.listdir(spool_dir):
+        path = os.path.join(spool_dir, name)
+        try:
+            if not os.path.isdir(path) or os.path.getmtime(path) >= cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        reaped += 1
+    if reaped:
+        print(f"Deleted {reaped} expired upload spool(s) from {spool_dir}")
+    return reaped
+
+
+class _Reaper(threading.Thread):
+    def __init__(self, spool_dir, interval):
+        super().__init__(name='upload-reaper', daemon=True)
+        self.spool_dir = spool_dir
+        self.interval = interval
+
+    def run(self):
+        while True:
+            try:
+                reap_spools(self.spool_dir)
+            except Exception as e:
+                print(f"Upload spool reaping failed: {e}")
+            time.sleep(self.interval)
+
+
+def start_reaper(spool_dir=None, interval=None):
+    """Start the background reaper for spool_dir once per process."""
+    spool_dir = os.path.abspath(spool_dir or UPLOAD_SPOOL_DIR)
+    with _reapers_lock:
+        if spool_dir not in _reapers:
+            reaper = _Reaper(spool_dir, interval or UPLOAD_REAP_INTERVAL)
+            _reapers[spool_dir] = reaper
+            reaper.start()
+    return _reapers[spool_dir]